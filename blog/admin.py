@@ -18,7 +18,7 @@ class PostAdmin(admin.ModelAdmin):
     inlines = [CommentInline]
     list_display = ['title', 'author', 'date_created', 'last_modified']
     list_filter = ['author', 'date_created']
-    search_fields = ['author', 'date_created']
+    search_fields = ['title', 'content', 'author__username']
     list_per_page = 10
 
 
@@ -5,3 +5,6 @@ class BlogConfig(AppConfig):
     verbose_name = 'Блог'
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'blog'
+
+    def ready(self):
+        from . import signals  # noqa: F401
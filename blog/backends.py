@@ -0,0 +1,67 @@
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.backends import ModelBackend
+from django.core.cache import cache
+from django.db import router
+
+UserModel = get_user_model()
+
+
+class CachedModelBackend(ModelBackend):
+    """
+    `ModelBackend`, загружающий пользователя сессии из кеша.
+
+    `AuthenticationMiddleware` на каждом запросе авторизованного пользователя получает его через `get_user`.
+    Здесь в кеше на `settings.BLOG_USER_CACHE_TIMEOUT` секунд хранятся только значения нужных полей (имя для
+    шаблонов, флаги для `user_can_authenticate` и админки) и хеш сессии пользователя, сам хеш пароля в общий кеш не
+    попадает. Из них собирается пользователь с отложенными остальными полями, а `get_session_auth_hash` возвращает
+    сохранённый хеш сессии, пока пароль не загружен или не изменён. Кеш сбрасывается сигналами `post_save`/`post_delete` пользователя
+    (`invalidate_cached_user`), поэтому смена пароля, блокировка и удаление действуют сразу. Остальные поля, включая
+    пароль, догружаются из БД при обращении к ним.
+
+    Using in:
+        - Settings: `AUTHENTICATION_BACKENDS`.
+        - Signals: `invalidate_cached_user`.
+
+    Attributes:
+        - fields (list): Поля пользователя, хранимые в кеше.
+    """
+    fields = ['id', 'username', 'is_active', 'is_staff', 'is_superuser', 'last_login']
+    key_prefix = 'blog:auth-user'
+
+    @classmethod
+    def make_key(cls, user_id):
+        return f'{cls.key_prefix}:{user_id}'
+
+    def get_user(self, user_id):
+        key = self.make_key(user_id)
+        data = cache.get(key)
+        if data is None:
+            try:
+                user = UserModel._default_manager.get(pk=user_id)
+            except UserModel.DoesNotExist:
+                return None
+            data = {
+                'values': {field: getattr(user, field) for field in self.fields},
+                'session_auth_hash': user.get_session_auth_hash(),
+            }
+            cache.set(key, data, settings.BLOG_USER_CACHE_TIMEOUT)
+        else:
+            user = self.build_user(data)
+        return user if self.user_can_authenticate(user) else None
+
+    def build_user(self, data):
+        """Собирает пользователя из значений полей в кеше, остальные поля отложены."""
+        # `from_db` сопоставляет значения полям в порядке `_meta.concrete_fields`, а не в порядке переданных имён.
+        names = [field.attname for field in UserModel._meta.concrete_fields if field.attname in data['values']]
+        user = UserModel.from_db(router.db_for_read(UserModel), names, [data['values'][name] for name in names])
+        compute_session_auth_hash = user.get_session_auth_hash
+
+        def get_session_auth_hash():
+            # Пока пароль не загружен и не изменён (`set_password`), хеш сессии берётся из кеша.
+            if 'password' in user.get_deferred_fields():
+                return data['session_auth_hash']
+            return compute_session_auth_hash()
+
+        user.get_session_auth_hash = get_session_auth_hash
+        return user
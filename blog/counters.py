@@ -0,0 +1,117 @@
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections, router, transaction
+from django.utils.module_loading import import_string
+
+from .models import Post
+
+
+class ExactPostCounter:
+    """
+    Точное количество постов через `COUNT(*)` на каждый запрос.
+
+    Using in:
+        - Views: `FeedView`, `PostsView` (через `get_post_counter`).
+    """
+
+    def count(self, author=None):
+        """
+        Возвращает количество постов.
+
+        Args:
+            author (User): Автор постов. Если не задан - возвращается количество всех постов.
+
+        Returns:
+            int: Количество постов.
+        """
+        return self.get_queryset(author).count()
+
+    async def acount(self, author=None):
+        """Асинхронная версия `count`."""
+        return await self.get_queryset(author).acount()
+
+    @staticmethod
+    def get_queryset(author=None):
+        queryset = Post.objects.all()
+        if author is not None:
+            queryset = queryset.filter(author=author)
+        return queryset
+
+    def adjust(self, author_id, delta):
+        """Учитывает создание (`delta=1`) или удаление (`delta=-1`) поста автора `author_id`."""
+
+
+class CachedPostCounter(ExactPostCounter):
+    """
+    Количество постов из кеша, поддерживаемое сигналами `post_save`/`post_delete` модели `Post`.
+
+    При промахе кеша количество считается `COUNT(*)` и кешируется на `BLOG_POST_COUNT_TIMEOUT` секунд,
+    дальше значение только увеличивается и уменьшается. Таймаут ограничивает время жизни расхождения, если
+    посты изменялись в обход сигналов (например, `bulk_create`). Для нескольких процессов нужен общий кеш
+    (`CACHE_BACKEND`).
+    """
+    key_prefix = 'blog:post_count'
+
+    def make_key(self, author_id=None):
+        return self.key_prefix if author_id is None else f'{self.key_prefix}:{author_id}'
+
+    def count(self, author=None):
+        key = self.make_key(author.pk if author is not None else None)
+        count = cache.get(key)
+        if count is None:
+            count = super().count(author)
+            cache.add(key, count, settings.BLOG_POST_COUNT_TIMEOUT)
+        return count
+
+    async def acount(self, author=None):
+        key = self.make_key(author.pk if author is not None else None)
+        count = await cache.aget(key)
+        if count is None:
+            count = await super().acount(author)
+            await cache.aadd(key, count, settings.BLOG_POST_COUNT_TIMEOUT)
+        return count
+
+    def adjust(self, author_id, delta):
+        # Кеш меняется только после фиксации транзакции: откаченное создание или удаление поста (в том числе
+        # пачка `import_posts`) не должно сдвигать счётчик.
+        transaction.on_commit(lambda: self.incr(author_id, delta), using=router.db_for_write(Post))
+
+    def incr(self, author_id, delta):
+        for key in (self.make_key(), self.make_key(author_id)):
+            try:
+                cache.incr(key, delta)
+            except ValueError:
+                pass
+
+
+class PostgresEstimatePostCounter(CachedPostCounter):
+    """
+    Общее количество постов по статистике планировщика PostgreSQL (`pg_class.reltuples`).
+
+    Оценка обновляется `ANALYZE`/autovacuum и может отличаться от точного количества, зато не требует
+    сканирования таблицы. Количество постов автора и общее количество на других СУБД (или для ещё не
+    проанализированной таблицы) берутся из `CachedPostCounter`.
+    """
+
+    def count(self, author=None):
+        if author is None:
+            connection = connections[router.db_for_read(Post)]
+            if connection.vendor == 'postgresql':
+                with connection.cursor() as cursor:
+                    cursor.execute('SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass',
+                                   [Post._meta.db_table])
+                    row = cursor.fetchone()
+                if row and row[0] >= 0:
+                    return row[0]
+        return super().count(author)
+
+    async def acount(self, author=None):
+        if author is None and connections[router.db_for_read(Post)].vendor == 'postgresql':
+            return await sync_to_async(self.count)()
+        return await super().acount(author)
+
+
+def get_post_counter():
+    """Возвращает счётчик постов, заданный в `settings.BLOG_POST_COUNTER`."""
+    return import_string(settings.BLOG_POST_COUNTER)()
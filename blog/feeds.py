@@ -0,0 +1,209 @@
+import hashlib
+from io import StringIO
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, Max
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.feedgenerator import Atom1Feed, Rss201rev2Feed
+from django.utils.xmlutils import SimplerXMLGenerator
+
+from .models import Post
+
+
+def cached_stream(key, generate, timeout):
+    """
+    Отдаёт части потокового ответа из кеша или генерирует их, кешируя каждую часть под ключом `key:<номер>`.
+
+    Кол-во частей записывается под `key` последним, поэтому ответ считается закешированным, только если записаны
+    все части. Если часть вытеснена из кеша во время отдачи, ответ генерируется заново с пропуском уже отданных
+    частей: `generate` для тех же данных (того же `key`) должен возвращать те же части.
+
+    Args:
+        key (str): Ключ кеша, меняющийся при изменении данных ответа.
+        generate (Callable): Функция без аргументов, возвращающая итератор частей ответа.
+        timeout (int): Время жизни частей в кеше в секундах.
+
+    Returns:
+        Iterator[str]: Части ответа.
+    """
+    chunks_count = cache.get(key)
+    sent = 0
+    if chunks_count is not None:
+        for number in range(chunks_count):
+            chunk = cache.get(f'{key}:{number}')
+            if chunk is None:
+                break
+            yield chunk
+            sent += 1
+        else:
+            return
+    number = 0
+    for number, chunk in enumerate(generate(), 1):
+        if number > sent:
+            cache.set(f'{key}:{number - 1}', chunk, timeout)
+            yield chunk
+    cache.set(key, number, timeout)
+
+
+class StreamingFeedMixin:
+    """
+    Потоковая запись ленты `django.utils.feedgenerator` без накопления записей в памяти.
+
+    `SyndicationFeed.write` выводит список `items`, собранный заранее. Здесь записи передаются итератором в
+    `stream`, который отдаёт готовый XML порциями по `chunk_size` записей. Дата обновления ленты передаётся
+    явно (`updated`), так как записей, по которым её вычисляет `latest_post_date`, заранее нет.
+    """
+    item_element = None
+
+    def __init__(self, *args, updated, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.updated = updated
+
+    def latest_post_date(self):
+        return self.updated
+
+    def start_feed(self, handler):
+        raise NotImplementedError
+
+    def end_feed(self, handler):
+        raise NotImplementedError
+
+    def make_item(self, **kwargs):
+        """Возвращает запись ленты в формате `SyndicationFeed.add_item`, не добавляя её в `items`."""
+        self.add_item(**kwargs)
+        return self.items.pop()
+
+    def stream(self, items, chunk_size):
+        """
+        Генерирует XML ленты порциями.
+
+        Args:
+            items (Iterable): Записи ленты - словари аргументов `SyndicationFeed.add_item`.
+            chunk_size (int): Кол-во записей в порции.
+
+        Returns:
+            Iterator[str]: Части XML. Границы порций зависят только от записей, поэтому для тех же данных
+             порции совпадают (см. `PostFeed.stream`).
+        """
+        buffer = StringIO()
+        handler = SimplerXMLGenerator(buffer, 'utf-8', short_empty_elements=True)
+        handler.startDocument()
+        self.start_feed(handler)
+        self.add_root_elements(handler)
+        for number, kwargs in enumerate(items, 1):
+            item = self.make_item(**kwargs)
+            handler.startElement(self.item_element, self.item_attributes(item))
+            self.add_item_elements(handler, item)
+            handler.endElement(self.item_element)
+            if number % chunk_size == 0:
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate()
+        self.end_feed(handler)
+        yield buffer.getvalue()
+
+
+class StreamingAtomFeed(StreamingFeedMixin, Atom1Feed):
+    item_element = 'entry'
+
+    def start_feed(self, handler):
+        handler.startElement('feed', self.root_attributes())
+
+    def end_feed(self, handler):
+        handler.endElement('feed')
+
+
+class StreamingRssFeed(StreamingFeedMixin, Rss201rev2Feed):
+    item_element = 'item'
+
+    def start_feed(self, handler):
+        handler.startElement('rss', self.rss_attributes())
+        handler.startElement('channel', self.root_attributes())
+
+    def end_feed(self, handler):
+        self.endChannelElement(handler)
+        handler.endElement('rss')
+
+
+class PostFeed:
+    """
+    Лента постов в формате Atom или RSS для всего блога или одного автора.
+
+    Лента содержит только `settings.BLOG_FEED_ITEMS` последних постов, как обычные ленты: агрегатору при каждом
+    изменении нужно загрузить только их, а не весь архив. Посты читаются `iterator(chunk_size=...)` и сразу записываются в ответ, поэтому в памяти одновременно
+    находится не больше порции постов. Готовые порции XML кешируются по отдельности (`cached_stream`) под
+    ключом, включающим дату последнего изменения постов и их количество: пока посты не меняются, лента
+    отдаётся из кеша без запросов постов к БД, а после изменения ключ меняется сам.
+
+    Using in:
+        - Views: `posts_feed_view`.
+
+    Attributes:
+        - feed_types (dict): Форматы ленты (параметр URL `feed_type`).
+        - fields (list): Поля поста (и автора), загружаемые для записей ленты.
+    """
+    feed_types = {'atom': StreamingAtomFeed, 'rss': StreamingRssFeed}
+    fields = ['title', 'slug', 'excerpt', 'date_created', 'last_modified', 'author__username']
+    key_prefix = 'blog:feed'
+
+    def __init__(self, request, feed_type, author=None):
+        self.request = request
+        self.feed_type = feed_type
+        self.author = author
+        self.chunk_size = settings.BLOG_FEED_CHUNK_SIZE
+        self.items_limit = settings.BLOG_FEED_ITEMS
+
+    def get_queryset(self):
+        queryset = Post.objects.all()
+        if self.author is not None:
+            queryset = queryset.filter(author=self.author)
+        return queryset
+
+    def get_validators(self):
+        """
+        Возвращает дату последнего изменения постов ленты и их количество (удаление поста не меняет максимум
+        `last_modified`) одним запросом.
+        """
+        aggregates = self.get_queryset().aggregate(latest=Max('last_modified'), count=Count('pk'))
+        return aggregates['latest'], aggregates['count']
+
+    def make_key(self, validators):
+        parts = [self.feed_type, self.author.pk if self.author else None, self.request.get_host(), *validators]
+        return f'{self.key_prefix}:{hashlib.md5(repr(parts).encode(), usedforsecurity=False).hexdigest()}'
+
+    def get_feed(self, updated):
+        # Для ленты без постов дата обновления - время генерации.
+        updated = updated or timezone.now()
+        if self.author is not None:
+            title = f'Посты {self.author.username}'
+            link = self.request.build_absolute_uri(reverse('blog:posts_list', args=[self.author.username]))
+        else:
+            title = 'My blog'
+            link = self.request.build_absolute_uri('/')
+        return self.feed_types[self.feed_type](title=title, link=link, description=title, language='ru',
+                                               feed_url=self.request.build_absolute_uri(), updated=updated)
+
+    def get_items(self):
+        posts = (self.get_queryset().select_related('author').only(*self.fields)
+                 .order_by('-date_created', '-pk')[:self.items_limit])
+        for post in posts.iterator(chunk_size=self.chunk_size):
+            link = self.request.build_absolute_uri(post.get_absolute_url())
+            yield {
+                'title': post.title,
+                'link': link,
+                'unique_id': link,
+                'description': post.excerpt,
+                'author_name': post.author.username,
+                'pubdate': post.date_created,
+                'updateddate': post.last_modified,
+            }
+
+    def generate(self, updated):
+        return self.get_feed(updated).stream(self.get_items(), self.chunk_size)
+
+    def stream(self, validators):
+        """Генерирует XML ленты из кеша или из БД (см. `cached_stream`)."""
+        return cached_stream(self.make_key(validators), lambda: self.generate(validators[0]),
+                             settings.BLOG_FEED_CACHE_TIMEOUT)
@@ -54,7 +54,8 @@ class AddCommentForm(forms.ModelForm):
 
     Fields:
         - text (str): Текст комментария.
-        - parent_comment (Comment): Родительский комментарий. Значением может быть NULL.
+        - parent_comment (Comment): Родительский комментарий. Значением может быть NULL. Ответ не может быть
+         вложен глубже `Comment.MAX_DEPTH`.
     """
     text = forms.CharField(label='', widget=forms.TextInput(attrs={"placeholder": "Введите текст"}))
     parent_comment = forms.ModelChoiceField(queryset=Comment.objects.all(), widget=forms.HiddenInput, required=False)
@@ -63,6 +64,13 @@ class AddCommentForm(forms.ModelForm):
         model = Comment
         fields = ['text', 'parent_comment']
 
+    def clean_parent_comment(self):
+        """Проверяет, что ответ на комментарий не превысит максимальный уровень вложенности."""
+        parent_comment = self.cleaned_data.get('parent_comment')
+        if parent_comment is not None and parent_comment.depth >= Comment.MAX_DEPTH:
+            raise forms.ValidationError('Слишком глубокая ветка комментариев, ответьте выше по ветке')
+        return parent_comment
+
 
 # Auth forms
 
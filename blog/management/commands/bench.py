@@ -0,0 +1,212 @@
+import random
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from time import perf_counter
+from urllib.request import urlopen
+
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.db.models import Count
+from django.test import Client
+from django.test.utils import (CaptureQueriesContext, override_settings, setup_test_environment,
+                               teardown_test_environment)
+from django.urls import reverse
+
+from blog.counters import CachedPostCounter
+from blog.models import Comment, Post
+from blog.page_cache import GENERATION_KEY, invalidate_pages
+
+
+def percentile(values, percent):
+    """Возвращает перцентиль `percent` отсортированного списка `values` (метод ближайшего ранга)."""
+    index = max(0, min(len(values) - 1, round(percent / 100 * len(values)) - 1))
+    return values[index]
+
+
+def isolated_caches():
+    """
+    Возвращает `settings.CACHES` с уникальным для прогона префиксом ключей.
+
+    Тестовая БД создаётся заново с теми же pk, поэтому ключи прошлых прогонов (сессии, пользователи, счётчики)
+    и ключи сайта, работающего с тем же Redis/Memcached, не должны быть видны прогону.
+    """
+    prefix = f'bench-{uuid.uuid4().hex[:8]}'
+    return {alias: {**config, 'KEY_PREFIX': f'{prefix}:{config.get("KEY_PREFIX", "")}'}
+            for alias, config in settings.CACHES.items()}
+
+
+class Command(BaseCommand):
+    """
+    Нагрузочный тест основных страниц блога.
+
+    Создаёт отдельную тестовую базу данных (для SQLite - в памяти), заполняет её синтетическими данными
+    (пользователи, посты, глубокие деревья комментариев) и прогоняет через тестовый клиент Django запросы к
+    `blog:feed_page`, `blog:posts_list`, `blog:post_detail` и отправку комментариев. Для каждого сценария
+    выводит перцентили времени ответа, пропускную способность и среднее кол-во SQL-запросов. Кеш используется
+    настроенный, но с отдельным префиксом ключей (`isolated_caches`), поэтому общий кеш сайта не очищается. Кеш
+    страниц целиком (`BLOG_PAGE_CACHE_TIMEOUT`) отключается: иначе после прогрева анонимные страницы отдаются из
+    него без запросов к БД, а команда измеряет стоимость представлений и ORM.
+
+    С параметром `--url` команда вместо тестового клиента отправляет GET-запросы по HTTP уже запущенному серверу
+    (`--concurrency` параллельных клиентов) с данными из настроенной БД, что позволяет сравнить классы воркеров
+    gunicorn. `--populate` предварительно заполняет настроенную БД синтетическими данными.
+
+    Пример:
+        DB_ENGINE=django.db.backends.sqlite3 python manage.py bench --posts 1000 --comments 2000
+        python manage.py bench --url http://127.0.0.1:8000 --concurrency 16 --requests 2000
+    """
+    help = 'Заполняет тестовую БД синтетическими данными и измеряет время ответа основных страниц.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=20, help='Кол-во пользователей.')
+        parser.add_argument('--posts', type=int, default=200, help='Кол-во постов.')
+        parser.add_argument('--comments', type=int, default=500, help='Кол-во комментариев на каждый "горячий" пост.')
+        parser.add_argument('--hot-posts', type=int, default=3, help='Кол-во постов с деревьями комментариев.')
+        parser.add_argument('--depth', type=int, default=10, help='Максимальная глубина дерева комментариев.')
+        parser.add_argument('--requests', type=int, default=100, help='Кол-во запросов на каждый сценарий.')
+        parser.add_argument('--warmup', type=int, default=5, help='Кол-во прогревочных запросов на сценарий.')
+        parser.add_argument('--seed', type=int, default=0, help='Начальное значение генератора случайных чисел.')
+        parser.add_argument('--keepdb', action='store_true', help='Не удалять тестовую БД после прогона.')
+        parser.add_argument('--url', help='Адрес запущенного сервера для нагрузки по HTTP.')
+        parser.add_argument('--concurrency', type=int, default=8, help='Кол-во параллельных HTTP-клиентов.')
+        parser.add_argument('--populate', action='store_true',
+                            help='Заполнить настроенную (не тестовую) БД синтетическими данными перед --url.')
+
+    def handle(self, *args, **options):
+        self.random = random.Random(options['seed'])
+        if options['url']:
+            if options['populate']:
+                self.seed(options)
+            self.run_http(options)
+            return
+        setup_test_environment()
+        old_name = connection.settings_dict['NAME']
+        connection.creation.create_test_db(verbosity=0, autoclobber=True, keepdb=options['keepdb'])
+        try:
+            with override_settings(CACHES=isolated_caches(), BLOG_PAGE_CACHE_TIMEOUT=0):
+                try:
+                    start = perf_counter()
+                    self.seed(options)
+                    self.stdout.write(f'Данные созданы за {perf_counter() - start:.1f} с '
+                                      f'({connection.vendor}, {options["users"]} пользователей, '
+                                      f'{options["posts"]} постов, {Comment.objects.count()} комментариев)')
+                    self.run_scenarios(options)
+                finally:
+                    # Поколение кеша страниц хранится без таймаута, остальные ключи прогона истекут сами.
+                    cache.delete(GENERATION_KEY)
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0, keepdb=options['keepdb'])
+            teardown_test_environment()
+
+    @transaction.atomic
+    def seed(self, options):
+        """Создаёт пользователей, посты и деревья комментариев."""
+        password = make_password('bench-password')
+        users = User.objects.bulk_create(
+            User(username=f'bench{i}', email=f'bench{i}@example.com', password=password)
+            for i in range(options['users'])
+        )
+        content = ' '.join(f'слово{i}' for i in range(300))
+        Post.objects.bulk_create(
+            (Post(title=f'Пост {i}', slug=f'post-{i}', content=content, excerpt=Post.make_excerpt(content),
+                  author=self.random.choice(users))
+             for i in range(options['posts'])),
+            batch_size=500,
+        )
+        self.hot_posts = list(Post.objects.order_by('?')[:options['hot_posts']])
+        for post in self.hot_posts:
+            comments = []
+            for i in range(options['comments']):
+                parent = None
+                if comments and self.random.random() < 0.7:
+                    parent = self.random.choice(comments[-options['depth']:])
+                    if parent.depth + 1 >= options['depth']:
+                        parent = None
+                comments.append(Comment.objects.create(post=post, author=self.random.choice(users),
+                                                       text=f'Комментарий {i}', parent_comment=parent))
+        self.users = users
+        # Посты созданы через bulk_create, в обход сигналов, поэтому после фиксации удаляются закешированные
+        # количества постов и сбрасывается кеш страниц. Остальной кеш (сессии, пользователи) не затрагивается.
+        counter = CachedPostCounter()
+        keys = [counter.make_key()] + [counter.make_key(user.pk) for user in users]
+        transaction.on_commit(lambda: (cache.delete_many(keys), invalidate_pages()))
+
+    def get_scenarios(self, options):
+        pages = max(1, options['posts'] // 5)
+        anonymous, authenticated = Client(), Client()
+        authenticated.force_login(self.users[0])
+        return {
+            'feed_page': lambda: anonymous.get(reverse('blog:feed_page'), {'page': self.random.randint(1, pages)}),
+            'posts_list': lambda: anonymous.get(
+                reverse('blog:posts_list', args=[self.random.choice(self.users).username])),
+            'post_detail': lambda: anonymous.get(self.random.choice(self.hot_posts).get_absolute_url()),
+            'post_detail (auth)': lambda: authenticated.get(self.random.choice(self.hot_posts).get_absolute_url()),
+            'add_comment': lambda: authenticated.post(self.random.choice(self.hot_posts).get_absolute_url(),
+                                                      {'text': 'Новый комментарий'}),
+        }
+
+    def write_header(self):
+        header = f'{"scenario":<20}{"req":>6}{"p50 ms":>10}{"p90 ms":>10}{"p99 ms":>10}{"max ms":>10}' \
+                 f'{"req/s":>10}{"queries":>10}'
+        self.stdout.write(header)
+        self.stdout.write('-' * len(header))
+
+    def write_row(self, name, timings, elapsed, queries):
+        timings.sort()
+        self.stdout.write(
+            f'{name:<20}{len(timings):>6}'
+            f'{percentile(timings, 50) * 1000:>10.2f}{percentile(timings, 90) * 1000:>10.2f}'
+            f'{percentile(timings, 99) * 1000:>10.2f}{timings[-1] * 1000:>10.2f}'
+            f'{len(timings) / elapsed:>10.1f}{queries / len(timings):>10.1f}'
+        )
+
+    def run_scenarios(self, options):
+        self.write_header()
+        for name, request in self.get_scenarios(options).items():
+            for _ in range(options['warmup']):
+                request()
+            timings = []
+            queries = 0
+            for _ in range(options['requests']):
+                with CaptureQueriesContext(connection) as context:
+                    start = perf_counter()
+                    response = request()
+                    timings.append(perf_counter() - start)
+                if response.status_code >= 400:
+                    self.stderr.write(f'{name}: HTTP {response.status_code}')
+                queries += len(context.captured_queries)
+            self.write_row(name, timings, sum(timings), queries)
+
+    def run_http(self, options):
+        """Нагружает запущенный сервер GET-запросами к ленте, страницам пользователей и постов."""
+        usernames = list(User.objects.filter(post__isnull=False).distinct()
+                         .values_list('username', flat=True)[:options['users']])
+        slugs = list(Post.objects.annotate(comments_count=Count('comments')).order_by('-comments_count')
+                     .values_list('slug', flat=True)[:options['hot_posts']])
+        pages = max(1, Post.objects.count() // 5)
+        scenarios = {
+            'feed_page': lambda: f'{reverse("blog:feed_page")}?page={self.random.randint(1, pages)}',
+            'posts_list': lambda: reverse('blog:posts_list', args=[self.random.choice(usernames)]),
+            'post_detail': lambda: reverse('blog:post_detail', args=[self.random.choice(slugs)]),
+        }
+
+        def fetch(path):
+            start = perf_counter()
+            with urlopen(options['url'].rstrip('/') + path) as response:
+                response.read()
+                queries = int(response.headers.get('X-DB-Queries', 0))
+            return perf_counter() - start, queries
+
+        self.write_header()
+        with ThreadPoolExecutor(options['concurrency']) as executor:
+            for name, make_path in scenarios.items():
+                list(executor.map(fetch, [make_path() for _ in range(options['warmup'] * options['concurrency'])]))
+                start = perf_counter()
+                results = list(executor.map(fetch, [make_path() for _ in range(options['requests'])]))
+                elapsed = perf_counter() - start
+                self.write_row(name, [timing for timing, _ in results], elapsed,
+                               sum(queries for _, queries in results))
@@ -0,0 +1,132 @@
+import hashlib
+from contextlib import contextmanager
+from pathlib import Path
+
+from django.apps import apps
+from django.conf import settings
+from django.contrib.staticfiles.finders import get_finders
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.db.migrations.executor import MigrationExecutor
+
+from blog.models import BootstrapStamp
+
+
+@contextmanager
+def advisory_lock(connection, lock_id):
+    """
+    Удерживает сессионную advisory-блокировку PostgreSQL, пока выполняется блок `with`.
+
+    Другие процессы, запрашивающие ту же блокировку, ждут её освобождения. Для остальных СУБД блокировка не
+    берётся: SQLite не разделяется между контейнерами, а запись в него и так сериализуется.
+    """
+    if connection.vendor != 'postgresql':
+        yield
+        return
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT pg_advisory_lock(%s)', [lock_id])
+    try:
+        yield
+    finally:
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT pg_advisory_unlock(%s)', [lock_id])
+
+
+def fingerprint(items):
+    """Возвращает sha256 от последовательности строк."""
+    digest = hashlib.sha256()
+    for item in items:
+        digest.update(item.encode())
+        digest.update(b'\0')
+    return digest.hexdigest()
+
+
+class Command(BaseCommand):
+    """
+    Идемпотентная инициализация при старте контейнера (вызывается из `entrypoint.sh`).
+
+    Выполняет только ту работу, которая ещё не сделана:
+        - `migrate` - если есть непримененные миграции;
+        - `loaddata` - если фикстура ещё не загружалась или изменилась (отпечаток содержимого хранится в
+          `BootstrapStamp`). Повторная загрузка неизменной фикстуры перезаписала бы сделанные через сайт
+          изменения тех же объектов;
+        - `collectstatic` - если изменился набор статических файлов (отпечаток путей, размеров и времени
+          изменения хранится в файле `STATIC_ROOT/.bootstrap`, рядом с собранной статикой).
+
+    Все шаги выполняются под advisory-блокировкой PostgreSQL, поэтому реплики, стартующие одновременно, ждут
+    первую, а затем видят, что работа уже сделана.
+
+    Пример:
+        python manage.py bootstrap
+        python manage.py bootstrap --fixture db_data --force
+    """
+    help = 'Применяет миграции, загружает фикстуру и собирает статику, если это ещё не сделано.'
+
+    LOCK_ID = 0x626c6f67
+    STATIC_STAMP = '.bootstrap'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--fixture', action='append', dest='fixtures',
+                            help='Имя фикстуры для загрузки (можно указать несколько раз), по умолчанию db_data.')
+        parser.add_argument('--no-static', action='store_false', dest='static', help='Не собирать статику.')
+        parser.add_argument('--force', action='store_true', help='Выполнить все шаги, даже если они уже выполнены.')
+        parser.add_argument('--database', default=DEFAULT_DB_ALIAS, help='Псевдоним БД.')
+
+    def handle(self, *args, **options):
+        self.force = options['force']
+        self.database = options['database']
+        self.call_options = {'verbosity': options['verbosity'], 'stdout': self.stdout, 'stderr': self.stderr}
+        connection = connections[self.database]
+        with advisory_lock(connection, self.LOCK_ID):
+            self.migrate(connection)
+            for fixture in options['fixtures'] or ['db_data']:
+                self.load_fixture(fixture)
+            if options['static']:
+                self.collect_static()
+
+    def migrate(self, connection):
+        executor = MigrationExecutor(connection)
+        plan = executor.migration_plan(executor.loader.graph.leaf_nodes())
+        if not plan and not self.force:
+            self.stdout.write('Миграции: все применены')
+            return
+        call_command('migrate', database=self.database, interactive=False, **self.call_options)
+
+    @staticmethod
+    def find_fixture_files(name):
+        """Возвращает файлы фикстуры `name` из каталогов `fixtures` приложений и `settings.FIXTURE_DIRS`."""
+        dirs = [Path(app_config.path) / 'fixtures' for app_config in apps.get_app_configs()]
+        dirs += [Path(fixture_dir) for fixture_dir in settings.FIXTURE_DIRS]
+        return sorted(path for fixture_dir in dirs if fixture_dir.is_dir() for path in fixture_dir.glob(f'{name}.*'))
+
+    def load_fixture(self, name):
+        files = self.find_fixture_files(name)
+        if not files:
+            self.stderr.write(f'Фикстура {name}: не найдена')
+            return
+        stamp_name = f'fixture:{name}'
+        value = fingerprint(hashlib.sha256(path.read_bytes()).hexdigest() for path in files)
+        stamps = BootstrapStamp.objects.using(self.database)
+        if not self.force and stamps.filter(name=stamp_name, fingerprint=value).exists():
+            self.stdout.write(f'Фикстура {name}: уже загружена')
+            return
+        call_command('loaddata', name, database=self.database, **self.call_options)
+        stamps.update_or_create(name=stamp_name, defaults={'fingerprint': value})
+
+    def get_static_fingerprint(self):
+        files = []
+        for finder in get_finders():
+            for path, storage in finder.list(['CVS', '.*', '*~']):
+                stat = Path(storage.path(path)).stat()
+                files.append(f'{getattr(storage, "prefix", None) or ""}/{path}:{stat.st_size}:{stat.st_mtime_ns}')
+        return fingerprint(sorted(files))
+
+    def collect_static(self):
+        stamp = Path(settings.STATIC_ROOT) / self.STATIC_STAMP
+        value = self.get_static_fingerprint()
+        if not self.force and stamp.is_file() and stamp.read_text() == value:
+            self.stdout.write('Статика: уже собрана')
+            return
+        call_command('collectstatic', interactive=False, **self.call_options)
+        stamp.write_text(value)
@@ -0,0 +1,72 @@
+import datetime
+import json
+import sys
+from time import perf_counter
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.core.serializers.json import DjangoJSONEncoder
+
+from blog.models import Comment, Post
+
+USER_FIELDS = ['username', 'email', 'first_name', 'last_name', 'password', 'is_active', 'is_staff', 'is_superuser',
+               'date_joined']
+POST_FIELDS = ['slug', 'title', 'content', 'date_created', 'last_modified']
+COMMENT_FIELDS = ['id', 'text', 'date_created']
+
+
+class ArchiveJSONEncoder(DjangoJSONEncoder):
+    """`DjangoJSONEncoder`, сохраняющий даты с микросекундами (он обрезает их до миллисекунд)."""
+
+    def default(self, o):
+        if isinstance(o, datetime.datetime):
+            return o.isoformat()
+        return super().default(o)
+
+
+class Command(BaseCommand):
+    """
+    Выгружает пользователей, посты и комментарии в NDJSON (одна JSON-запись на строку) для `import_posts`.
+
+    Записи читаются из БД итераторами и пишутся построчно, поэтому память не зависит от размера архива.
+    Порядок записей - тот, который нужен `import_posts`: сначала пользователи, затем посты, затем комментарии,
+    сгруппированные по постам в порядке pk (родитель создан раньше ответов, а новые pk при импорте сохраняют
+    порядок комментариев в ветке). Посты и авторы ссылаются друг на друга по `slug` и `username`, комментарии на
+    родителя - по `id` из архива.
+
+    Пример:
+        python manage.py export_posts archive.ndjson
+        python manage.py export_posts - | gzip > archive.ndjson.gz
+    """
+    help = 'Выгружает пользователей, посты и комментарии в NDJSON.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('output', help='Файл для записи, "-" - stdout.')
+        parser.add_argument('--chunk-size', type=int, default=2000, help='Кол-во строк, читаемых из БД за раз.')
+
+    def get_records(self, chunk_size):
+        for user in User.objects.order_by('pk').values(*USER_FIELDS).iterator(chunk_size=chunk_size):
+            yield {'model': 'user', **user}
+        posts = Post.objects.order_by('pk').values(*POST_FIELDS, 'author__username')
+        for post in posts.iterator(chunk_size=chunk_size):
+            yield {'model': 'post', 'author': post.pop('author__username'), **post}
+        comments = (Comment.objects.order_by('post_id', 'pk')
+                    .values(*COMMENT_FIELDS, 'parent_comment_id', 'post__slug', 'author__username'))
+        for comment in comments.iterator(chunk_size=chunk_size):
+            yield {'model': 'comment', 'parent': comment.pop('parent_comment_id'), 'post': comment.pop('post__slug'),
+                   'author': comment.pop('author__username'), **comment}
+
+    def handle(self, *args, **options):
+        output = sys.stdout if options['output'] == '-' else open(options['output'], 'w', encoding='utf-8')
+        start = perf_counter()
+        count = 0
+        try:
+            for record in self.get_records(options['chunk_size']):
+                output.write(json.dumps(record, cls=ArchiveJSONEncoder, ensure_ascii=False))
+                output.write('\n')
+                count += 1
+        finally:
+            if output is not sys.stdout:
+                output.close()
+        elapsed = perf_counter() - start
+        self.stderr.write(f'Выгружено записей: {count} за {elapsed:.1f} с ({count / max(elapsed, 1e-9):.0f} строк/с)')
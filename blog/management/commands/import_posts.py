@@ -0,0 +1,218 @@
+import json
+import sys
+from collections import Counter
+from time import perf_counter
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections, router, transaction
+from django.utils.dateparse import parse_datetime
+
+from blog.counters import get_post_counter
+from blog.models import Comment, ImportedComment, ImportedPost, Post
+from blog.page_cache import invalidate_pages
+from blog.search import get_search_backend
+
+
+def update_rows(model, fields, rows):
+    """
+    Обновляет поля `fields` строк модели `model` одним `executemany`.
+
+    `QuerySet.bulk_update` строит `CASE WHEN` по каждой строке пачки, и на десятках тысяч строк построение
+    выражений ORM занимает больше времени, чем сама вставка. Здесь выполняется один подготовленный `UPDATE`
+    с параметрами для каждой строки.
+
+    Args:
+        model (Model): Модель.
+        fields (list): Имена полей.
+        rows (Iterable): Кортежи значений полей, последний элемент - pk строки.
+    """
+    connection = connections[router.db_for_write(model)]
+    quote = connection.ops.quote_name
+    model_fields = [model._meta.get_field(name) for name in fields]
+    assignments = ', '.join(f'{quote(field.column)} = %s' for field in model_fields)
+    sql = f'UPDATE {quote(model._meta.db_table)} SET {assignments} WHERE {quote(model._meta.pk.column)} = %s'
+    params = [[field.get_db_prep_save(value, connection) for field, value in zip(model_fields, row)] + [row[-1]]
+              for row in rows]
+    with connection.cursor() as cursor:
+        cursor.executemany(sql, params)
+
+
+class Command(BaseCommand):
+    """
+    Загружает пользователей, посты и комментарии из NDJSON, выгруженного `export_posts`.
+
+    Файл читается построчно, записи копятся пачками по `--batch-size` и вставляются `bulk_create`, каждая пачка в
+    отдельной транзакции, поэтому память не зависит от размера архива, а сигналы на каждую строку не вызываются.
+    Вместо сигналов команда сама поддерживает производные данные: `excerpt` и поисковый индекс новых постов,
+    счётчики постов, `path`/`depth` и счётчики комментариев, кеш страниц.
+
+    Ссылки разрешаются в порядке зависимостей: авторы - по `username`, посты комментариев - по `slug`, родительские
+    комментарии - по `id` из архива, поэтому родитель должен идти раньше ответов (порядок `export_posts`). Созданные
+    посты и соответствие `id` комментариев из архива новым комментариям записываются в БД (`ImportedPost`,
+    `ImportedComment`) в тех же транзакциях, что и сами строки, и в памяти не держатся. Существующие пользователи и
+    посты с тем же `slug` пропускаются. Комментарии загружаются только в посты, созданные импортом: комментарии
+    поста сайта с тем же `slug` пропускаются, а уже загруженные `id` из архива - тоже, поэтому повторный запуск
+    после прерванного импорта догружает оставшееся и ничего не дублирует.
+
+    Пример:
+        python manage.py import_posts archive.ndjson --batch-size 5000
+        gunzip -c archive.ndjson.gz | python manage.py import_posts -
+    """
+    help = 'Загружает пользователей, посты и комментарии из NDJSON пачками bulk_create.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('input', help='Файл NDJSON, "-" - stdin.')
+        parser.add_argument('--batch-size', type=int, default=1000, help='Кол-во записей в одной пачке.')
+
+    def handle(self, *args, **options):
+        self.batch_size = options['batch_size']
+        self.created = Counter()
+        self.skipped = Counter()
+        self.batch = []
+        self.batch_model = None
+        # Пост текущих комментариев, `post_pk` равен None, если пост не создан импортом.
+        self.post_slug = None
+        self.post_pk = None
+        self.search_backend = get_search_backend()
+
+        input_file = sys.stdin if options['input'] == '-' else open(options['input'], encoding='utf-8')
+        start = perf_counter()
+        try:
+            for line_number, line in enumerate(input_file, 1):
+                if not line.strip():
+                    continue
+                try:
+                    record = json.loads(line)
+                except ValueError as e:
+                    raise CommandError(f'Строка {line_number}: {e}')
+                self.add(record, line_number)
+            self.flush()
+        finally:
+            if input_file is not sys.stdin:
+                input_file.close()
+        invalidate_pages()
+
+        elapsed = perf_counter() - start
+        total = sum(self.created.values())
+        for model in ('user', 'post', 'comment'):
+            self.stdout.write(f'{model}: создано {self.created[model]}, пропущено {self.skipped[model]}')
+        self.stdout.write(f'Всего: {total} за {elapsed:.1f} с ({total / max(elapsed, 1e-9):.0f} строк/с)')
+
+    def add(self, record, line_number):
+        model = record.get('model')
+        if model not in ('user', 'post', 'comment'):
+            raise CommandError(f'Строка {line_number}: неизвестная модель {model!r}')
+        if model == 'comment' and record['post'] != self.post_slug:
+            self.flush()
+            self.start_post(record['post'])
+        if model != self.batch_model or len(self.batch) >= self.batch_size:
+            self.flush()
+            self.batch_model = model
+        record['line'] = line_number
+        self.batch.append(record)
+
+    def flush(self):
+        if not self.batch:
+            return
+        with transaction.atomic():
+            getattr(self, f'import_{self.batch_model}s')(self.batch)
+        self.batch = []
+
+    def import_users(self, records):
+        existing = set(User.objects.filter(username__in=[record['username'] for record in records])
+                       .values_list('username', flat=True))
+        fields = [field for field in records[0] if field not in ('model', 'line')]
+        users = [User(**{field: record[field] for field in fields})
+                 for record in records if record['username'] not in existing]
+        User.objects.bulk_create(users)
+        self.created['user'] += len(users)
+        self.skipped['user'] += len(records) - len(users)
+
+    def get_authors(self, records):
+        usernames = {record['author'] for record in records}
+        authors = dict(User.objects.filter(username__in=usernames).values_list('username', 'pk'))
+        for record in records:
+            if record['author'] not in authors:
+                raise CommandError(f'Строка {record["line"]}: нет пользователя {record["author"]!r}')
+        return authors
+
+    def import_posts(self, records):
+        authors = self.get_authors(records)
+        existing = set(Post.objects.filter(slug__in=[record['slug'] for record in records])
+                       .values_list('slug', flat=True))
+        records = [record for record in records if record['slug'] not in existing]
+        posts = [Post(slug=record['slug'], title=record['title'], content=record['content'],
+                      excerpt=Post.make_excerpt(record['content']), author_id=authors[record['author']])
+                 for record in records]
+        Post.objects.bulk_create(posts)
+        ImportedPost.objects.bulk_create(ImportedPost(post=post) for post in posts)
+        # bulk_create проставляет auto_now/auto_now_add текущим временем, даты из архива записываются отдельно.
+        update_rows(Post, ['date_created', 'last_modified'],
+                    ((parse_datetime(record['date_created']), parse_datetime(record['last_modified']), post.pk)
+                     for post, record in zip(posts, records)))
+        self.search_backend.index_many(posts)
+        for author_id, count in Counter(post.author_id for post in posts).items():
+            get_post_counter().adjust(author_id, count)
+        self.created['post'] += len(posts)
+        self.skipped['post'] += len(existing)
+
+    def start_post(self, slug):
+        """Переключает импорт комментариев на пост `slug`. Комментарии поста, не созданного импортом, пропускаются."""
+        self.post_slug = slug
+        post = Post.objects.filter(slug=slug).values('pk', 'import_record').first()
+        if post is None:
+            raise CommandError(f'Нет поста {slug!r}')
+        self.post_pk = post['pk'] if post['import_record'] is not None else None
+
+    def get_parents(self, records):
+        """
+        Загружает уже импортированные родительские комментарии записей `records`.
+
+        Returns:
+            dict: id из архива -> (pk, path, depth).
+        """
+        ids = {record['parent'] for record in records if record['parent'] is not None}
+        ids -= {record['id'] for record in records}
+        imported = (ImportedComment.objects.filter(post_id=self.post_pk, archive_id__in=ids)
+                    .values_list('archive_id', 'comment_id', 'comment__path', 'comment__depth'))
+        return {archive_id: (pk, path, depth) for archive_id, pk, path, depth in imported}
+
+    def import_comments(self, records):
+        if self.post_pk is None:
+            self.skipped['comment'] += len(records)
+            return
+        imported = set(ImportedComment.objects.filter(post_id=self.post_pk,
+                                                      archive_id__in=[record['id'] for record in records])
+                       .values_list('archive_id', flat=True))
+        self.skipped['comment'] += len(imported)
+        records = [record for record in records if record['id'] not in imported]
+        if not records:
+            return
+        authors = self.get_authors(records)
+        parents = self.get_parents(records)
+        comments = [Comment(post_id=self.post_pk, author_id=authors[record['author']], text=record['text'])
+                    for record in records]
+        Comment.objects.bulk_create(comments)
+        # Пути строятся из pk, поэтому родитель, путь, уровень и дата записываются вторым запросом. Родитель
+        # идёт в архиве раньше ответов: он либо в этой пачке выше, либо уже импортирован.
+        rows = []
+        for comment, record in zip(comments, records):
+            parent_pk, parent_path, parent_depth = None, '', -1
+            if record['parent'] is not None:
+                if record['parent'] not in parents:
+                    raise CommandError(f'Строка {record["line"]}: родительский комментарий {record["parent"]} '
+                                       f'не найден среди предыдущих комментариев поста')
+                parent_pk, parent_path, parent_depth = parents[record['parent']]
+                if parent_depth >= Comment.MAX_DEPTH:
+                    raise CommandError(f'Строка {record["line"]}: уровень вложенности комментария больше '
+                                       f'{Comment.MAX_DEPTH}')
+            path = Comment.make_path(parent_path, comment.pk)
+            parents[record['id']] = (comment.pk, path, parent_depth + 1)
+            rows.append((parent_pk, path, parent_depth + 1, parse_datetime(record['date_created']), comment.pk))
+        update_rows(Comment, ['parent_comment', 'path', 'depth', 'date_created'], rows)
+        ImportedComment.objects.bulk_create(
+            ImportedComment(post_id=self.post_pk, archive_id=record['id'], comment_id=comment.pk)
+            for comment, record in zip(comments, records))
+        Post.objects.filter(pk=self.post_pk).update(**Post.get_comment_stats())
+        self.created['comment'] += len(comments)
@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Max
+
+from blog.models import Post
+
+
+class Command(BaseCommand):
+    """
+    Пересчитывает `Post.comment_count` и `Post.last_comment_at` по таблице комментариев.
+
+    Счётчики поддерживаются сигналами модели `Comment` и могут разойтись с данными, если комментарии изменялись в
+    обход сигналов (`bulk_create`, `QuerySet.delete()` без сигналов, SQL). Посты обновляются диапазонами первичных
+    ключей по `--batch-size`, каждый диапазон в отдельной транзакции, чтобы не блокировать всю таблицу.
+
+    Пример:
+        python manage.py recount_comments --batch-size 5000
+    """
+    help = 'Пересчитывает кол-во комментариев и дату последнего комментария постов.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help='Кол-во постов в одном UPDATE.')
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        max_pk = Post.objects.aggregate(max_pk=Max('pk'))['max_pk'] or 0
+        updated = 0
+        for start in range(1, max_pk + 1, batch_size):
+            with transaction.atomic():
+                updated += (Post.objects.filter(pk__gte=start, pk__lt=start + batch_size)
+                            .update(**Post.get_comment_stats()))
+        self.stdout.write(f'Пересчитано постов: {updated}')
@@ -0,0 +1,254 @@
+import logging
+import threading
+from collections import defaultdict
+from contextvars import ContextVar
+from time import perf_counter
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+
+from django_blog.db import replica_reads
+
+logger = logging.getLogger('blog.performance')
+
+# Метрики обрабатываемого запроса. Переменная контекста, а не атрибут соединения: при запуске через ASGI
+# запросы ORM выполняются в потоке `sync_to_async` со своими соединениями, а контекст переходит туда вместе с ними.
+request_metrics = ContextVar('request_metrics', default=None)
+
+
+class QueryBudgetExceeded(Exception):
+    """Представление выполнило больше SQL-запросов, чем разрешено `settings.BLOG_QUERY_BUDGETS`."""
+
+
+class RequestMetrics:
+    """
+    Метрики одного запроса.
+
+    Attributes:
+        - queries (int): Кол-во SQL-запросов.
+        - db_time (float): Суммарное время SQL-запросов в секундах.
+        - render_time (float): Время рендеринга шаблона в секундах (только для `TemplateResponse`).
+        - total_time (float): Полное время обработки запроса в секундах.
+    """
+
+    def __init__(self):
+        self.queries = 0
+        self.db_time = 0.0
+        self.render_time = 0.0
+        self.total_time = 0.0
+        self._render_started = None
+
+    def __call__(self, execute, sql, params, many, context):
+        """Обёртка `connection.execute_wrapper`, считающая запросы и их время."""
+        start = perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries += 1
+            self.db_time += perf_counter() - start
+
+    def start_render(self):
+        self._render_started = perf_counter()
+
+    def finish_render(self, response):
+        self.render_time = perf_counter() - self._render_started
+
+
+class PerformanceStats:
+    """
+    Накопленные метрики запросов по именам URL (`blog:feed_page`, `blog:post_detail`, ...) в рамках процесса.
+
+    Using in:
+        - Middleware: `PerformanceMiddleware`.
+        - Views: `performance_stats_view`.
+    """
+    fields = ('queries', 'db_time', 'render_time', 'total_time')
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._totals = defaultdict(lambda: dict.fromkeys(('requests',) + self.fields, 0))
+
+    def record(self, view_name, metrics):
+        with self._lock:
+            totals = self._totals[view_name]
+            totals['requests'] += 1
+            for field in self.fields:
+                totals[field] += getattr(metrics, field)
+
+    def summary(self):
+        """
+        Возвращает средние значения метрик по каждому имени URL.
+
+        Returns:
+            dict: Имя URL -> кол-во запросов и средние значения метрик (время в миллисекундах).
+        """
+        with self._lock:
+            totals = {name: dict(values) for name, values in self._totals.items()}
+        summary = {}
+        for name, values in totals.items():
+            requests = values['requests']
+            summary[name] = {
+                'requests': requests,
+                'queries': round(values['queries'] / requests, 2),
+                **{field: round(values[field] / requests * 1000, 2) for field in self.fields[1:]},
+            }
+        return summary
+
+    def reset(self):
+        with self._lock:
+            self._totals.clear()
+
+
+stats = PerformanceStats()
+
+
+def track_queries(execute, sql, params, many, context):
+    """
+    Обёртка `execute_wrapper`, подключённая ко всем соединениям сигналом `connection_created`.
+
+    Учитывает запрос в метриках текущего запроса `request_metrics`, вне запроса только выполняет его.
+    """
+    metrics = request_metrics.get()
+    if metrics is None:
+        return execute(sql, params, many, context)
+    return metrics(execute, sql, params, many, context)
+
+
+class PerformanceMiddleware:
+    """
+    Измеряет кол-во SQL-запросов, время БД, время рендеринга шаблона и полное время обработки запроса.
+
+    Метрики накапливаются в `stats` по имени URL, пишутся в лог `blog.performance` и, если включено
+    `settings.BLOG_PERFORMANCE_HEADERS`, отдаются в заголовках `Server-Timing` и `X-DB-Queries`.
+    Если представление превысило бюджет запросов из `settings.BLOG_QUERY_BUDGETS`, в лог пишется
+    предупреждение, а при `settings.BLOG_QUERY_BUDGETS_STRICT` выбрасывается `QueryBudgetExceeded`
+    (используется в тестах, чтобы регрессия роняла тест).
+
+    Должен стоять первым в `MIDDLEWARE`, чтобы учитывать время остальных middleware. Работает и в синхронном,
+    и в асинхронном режиме, поэтому при запуске через ASGI не переключает обработку запроса в поток.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+            # Синхронные методы асинхронного middleware Django вызывает через sync_to_async.
+            self.process_template_response = self.aprocess_template_response
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        metrics = request.performance_metrics = RequestMetrics()
+        token = request_metrics.set(metrics)
+        start = perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            request_metrics.reset(token)
+        return self.finish(request, response, metrics, start)
+
+    async def __acall__(self, request):
+        metrics = request.performance_metrics = RequestMetrics()
+        token = request_metrics.set(metrics)
+        start = perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            request_metrics.reset(token)
+        return self.finish(request, response, metrics, start)
+
+    def finish(self, request, response, metrics, start):
+        metrics.total_time = perf_counter() - start
+        view_name = request.resolver_match.view_name if request.resolver_match else None
+        stats.record(view_name, metrics)
+        logger.debug('%s %s view=%s queries=%d db=%.1fms render=%.1fms total=%.1fms',
+                     request.method, request.path, view_name, metrics.queries, metrics.db_time * 1000,
+                     metrics.render_time * 1000, metrics.total_time * 1000)
+        if settings.BLOG_PERFORMANCE_HEADERS:
+            response['X-DB-Queries'] = metrics.queries
+            response['Server-Timing'] = (f'db;dur={metrics.db_time * 1000:.1f};desc="{metrics.queries} queries", '
+                                         f'render;dur={metrics.render_time * 1000:.1f}, '
+                                         f'total;dur={metrics.total_time * 1000:.1f}')
+        self.check_budget(request, view_name, metrics)
+        return response
+
+    def process_template_response(self, request, response):
+        return self.track_render(request, response)
+
+    async def aprocess_template_response(self, request, response):
+        return self.track_render(request, response)
+
+    @staticmethod
+    def track_render(request, response):
+        metrics = request.performance_metrics
+        metrics.start_render()
+        response.add_post_render_callback(metrics.finish_render)
+        return response
+
+    @staticmethod
+    def check_budget(request, view_name, metrics):
+        budget = settings.BLOG_QUERY_BUDGETS.get(view_name)
+        if budget is None or metrics.queries <= budget:
+            return
+        message = f'{view_name} ({request.path}) executed {metrics.queries} queries, budget is {budget}'
+        if settings.BLOG_QUERY_BUDGETS_STRICT:
+            raise QueryBudgetExceeded(message)
+        logger.warning(message)
+
+
+class ReplicaPinningMiddleware:
+    """
+    Включает чтение с реплик БД для GET-запросов к представлениям с атрибутом `replica_reads = True`.
+
+    После изменяющего запроса (POST и т. п.) клиенту ставится cookie `primary_pin` на
+    `settings.BLOG_REPLICA_PIN_SECONDS` секунд: пока она есть, все его запросы читают с primary и видят свои
+    изменения (новый пост, комментарий) даже при отставании реплик. Без настроенных реплик ничего не делает.
+
+    Должен стоять после `AuthenticationMiddleware`. Работает и в синхронном, и в асинхронном режиме.
+    """
+    cookie_name = 'primary_pin'
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+            self.process_view = self.aprocess_view
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        try:
+            response = self.get_response(request)
+        finally:
+            replica_reads.set(False)
+        return self.pin_primary(request, response)
+
+    async def __acall__(self, request):
+        try:
+            response = await self.get_response(request)
+        finally:
+            replica_reads.set(False)
+        return self.pin_primary(request, response)
+
+    def pin_primary(self, request, response):
+        if settings.DB_REPLICAS and request.method not in ('GET', 'HEAD', 'OPTIONS', 'TRACE'):
+            response.set_cookie(self.cookie_name, '1', max_age=settings.BLOG_REPLICA_PIN_SECONDS,
+                                httponly=True, samesite='Lax')
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        self.enable_replica_reads(request, view_func)
+
+    async def aprocess_view(self, request, view_func, view_args, view_kwargs):
+        # Вызывается в задаче запроса, поэтому `replica_reads` видно асинхронному представлению.
+        self.enable_replica_reads(request, view_func)
+
+    def enable_replica_reads(self, request, view_func):
+        view_class = getattr(view_func, 'view_class', None)
+        if (settings.DB_REPLICAS and request.method in ('GET', 'HEAD') and self.cookie_name not in request.COOKIES
+                and getattr(view_class, 'replica_reads', False)):
+            replica_reads.set(True)
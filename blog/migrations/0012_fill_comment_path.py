@@ -0,0 +1,39 @@
+from django.db import migrations
+
+PATH_STEP = 10
+BATCH_SIZE = 1000
+
+
+def make_path(parent_path, pk):
+    return f'{parent_path}{10 ** PATH_STEP - 1 - pk:0{PATH_STEP}d}'
+
+
+def fill_comment_path(apps, schema_editor):
+    """Заполняет `path` и `depth` существующих комментариев, обходя деревья от корней."""
+    Comment = apps.get_model('blog', 'Comment')
+    children = {}
+    for pk, parent_pk in Comment.objects.values_list('pk', 'parent_comment_id').iterator():
+        children.setdefault(parent_pk, []).append(pk)
+
+    batch = []
+    stack = [(pk, '', 0) for pk in children.get(None, [])]
+    while stack:
+        pk, parent_path, depth = stack.pop()
+        path = make_path(parent_path, pk)
+        batch.append(Comment(pk=pk, path=path, depth=depth))
+        stack.extend((child, path, depth + 1) for child in children.get(pk, []))
+        if len(batch) >= BATCH_SIZE:
+            Comment.objects.bulk_update(batch, ['path', 'depth'])
+            batch = []
+    Comment.objects.bulk_update(batch, ['path', 'depth'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0011_comment_path_depth'),
+    ]
+
+    operations = [
+        migrations.RunPython(fill_comment_path, migrations.RunPython.noop),
+    ]
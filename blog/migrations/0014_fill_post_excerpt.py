@@ -0,0 +1,29 @@
+from django.db import migrations
+from django.template.defaultfilters import linebreaks_filter, truncatewords
+
+EXCERPT_WORDS = 50
+BATCH_SIZE = 500
+
+
+def fill_post_excerpt(apps, schema_editor):
+    """Заполняет `excerpt` существующих постов."""
+    Post = apps.get_model('blog', 'Post')
+    batch = []
+    for post in Post.objects.only('pk', 'content').iterator(chunk_size=BATCH_SIZE):
+        post.excerpt = truncatewords(linebreaks_filter(post.content), EXCERPT_WORDS)
+        batch.append(post)
+        if len(batch) >= BATCH_SIZE:
+            Post.objects.bulk_update(batch, ['excerpt'])
+            batch = []
+    Post.objects.bulk_update(batch, ['excerpt'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0013_post_excerpt'),
+    ]
+
+    operations = [
+        migrations.RunPython(fill_post_excerpt, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 5.1.1 on 2026-10-18 18:14
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0014_fill_post_excerpt'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BootstrapStamp',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100, unique=True)),
+                ('fingerprint', models.CharField(max_length=64)),
+                ('date_applied', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Отметка инициализации',
+                'verbose_name_plural': 'Отметки инициализации',
+            },
+        ),
+    ]
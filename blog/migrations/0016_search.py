@@ -0,0 +1,34 @@
+# Generated by Django 5.1.1 on 2026-10-18 18:15
+
+import django.contrib.postgres.search
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0015_bootstrapstamp'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.CreateModel(
+            name='PostTerm',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('term', models.CharField(max_length=100)),
+                ('weight', models.PositiveIntegerField()),
+                ('post', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='terms', to='blog.post')),
+            ],
+            options={
+                'verbose_name': 'Термин поста',
+                'verbose_name_plural': 'Термины постов',
+                'constraints': [models.UniqueConstraint(fields=('term', 'post'), name='UNQ_post_terms_term_post')],
+            },
+        ),
+    ]
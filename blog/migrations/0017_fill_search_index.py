@@ -0,0 +1,61 @@
+import re
+from collections import Counter
+
+from django.conf import settings
+from django.contrib.postgres.search import SearchVector
+from django.db import migrations
+
+BATCH_SIZE = 500
+TITLE_WEIGHT = 4
+INDEX_NAME = 'IDX_posts_search_vector'
+
+
+def tokenize(text):
+    text = text.lower().replace('ё', 'е')
+    return [word[:100] for word in re.findall(r'\w+', text) if len(word) > 1]
+
+
+def fill_search_index(apps, schema_editor):
+    """
+    Строит поисковый индекс существующих постов.
+
+    На PostgreSQL заполняет `search_vector` и создаёт GIN-индекс (в `Meta.indexes` его не описать: на SQLite
+    такой индекс не создаётся), на остальных СУБД заполняет инвертированный индекс `PostTerm`.
+    """
+    Post = apps.get_model('blog', 'Post')
+    if schema_editor.connection.vendor == 'postgresql':
+        config = settings.BLOG_SEARCH_CONFIG
+        Post.objects.update(search_vector=SearchVector('title', weight='A', config=config)
+                            + SearchVector('content', weight='B', config=config))
+        schema_editor.execute(f'CREATE INDEX IF NOT EXISTS {schema_editor.quote_name(INDEX_NAME)} '
+                              f'ON {schema_editor.quote_name(Post._meta.db_table)} USING gin (search_vector)')
+        return
+    PostTerm = apps.get_model('blog', 'PostTerm')
+    batch = []
+    for post in Post.objects.only('pk', 'title', 'content').iterator(chunk_size=BATCH_SIZE):
+        weights = Counter(tokenize(post.content))
+        for term in tokenize(post.title):
+            weights[term] += TITLE_WEIGHT
+        batch.extend(PostTerm(post=post, term=term, weight=weight) for term, weight in weights.items())
+        if len(batch) >= BATCH_SIZE:
+            PostTerm.objects.bulk_create(batch)
+            batch = []
+    PostTerm.objects.bulk_create(batch)
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(f'DROP INDEX IF EXISTS {schema_editor.quote_name(INDEX_NAME)}')
+    else:
+        apps.get_model('blog', 'PostTerm').objects.all().delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0016_search'),
+    ]
+
+    operations = [
+        migrations.RunPython(fill_search_index, drop_search_index),
+    ]
@@ -0,0 +1,25 @@
+from django.db import migrations
+from django.db.models import Count, Max, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def fill_post_comment_stats(apps, schema_editor):
+    """Заполняет `comment_count` и `last_comment_at` существующих постов."""
+    Post = apps.get_model('blog', 'Post')
+    Comment = apps.get_model('blog', 'Comment')
+    comments = Comment.objects.filter(post=OuterRef('pk')).order_by().values('post')
+    Post.objects.update(
+        comment_count=Coalesce(Subquery(comments.annotate(count=Count('pk')).values('count')), 0),
+        last_comment_at=Subquery(comments.annotate(latest=Max('date_created')).values('latest')),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0019_post_comment_stats'),
+    ]
+
+    operations = [
+        migrations.RunPython(fill_post_comment_stats, migrations.RunPython.noop),
+    ]
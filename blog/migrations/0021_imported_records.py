@@ -0,0 +1,38 @@
+# Generated by Django 5.1.1 on 2026-10-18 19:04
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0020_fill_post_comment_stats'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImportedPost',
+            fields=[
+                ('post', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='import_record', serialize=False, to='blog.post')),
+            ],
+            options={
+                'verbose_name': 'Импортированный пост',
+                'verbose_name_plural': 'Импортированные посты',
+            },
+        ),
+        migrations.CreateModel(
+            name='ImportedComment',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('archive_id', models.PositiveBigIntegerField()),
+                ('comment', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='import_record', to='blog.comment')),
+                ('post', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='blog.post')),
+            ],
+            options={
+                'verbose_name': 'Импортированный комментарий',
+                'verbose_name_plural': 'Импортированные комментарии',
+                'constraints': [models.UniqueConstraint(fields=('post', 'archive_id'), name='UNQ_imported_comments_post_archive_id')],
+            },
+        ),
+    ]
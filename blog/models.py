@@ -1,8 +1,11 @@
 from datetime import timedelta
 
 from django.contrib.auth.models import User
+from django.contrib.postgres.search import SearchVectorField
 from django.db import models
-from django.template.defaultfilters import timesince
+from django.db.models import Count, F, Max, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce, Concat, Substr
+from django.template.defaultfilters import linebreaks_filter, timesince, truncatewords
 from django.urls import reverse
 from django.utils import timezone, dateformat
 
@@ -26,7 +29,17 @@ class Post(models.Model):
         - slug (str): Строка используемая для построения адреса к посту.
         - last_modified (datetime.datetime): Дата последнего изменения поста.
         - date_created (datetime.datetime): Дата создания поста.
+        - excerpt (str): HTML превью текста поста для списков постов. Обновляется при сохранении поста.
+        - search_vector (str): Поисковый вектор заголовка и текста поста (только PostgreSQL, GIN-индекс
+         создаётся миграцией `0017_fill_search_index`). Обновляется сигналом `post_save`, см. `blog.search`.
+        - comment_count (int): Кол-во комментариев к посту.
+        - last_comment_at (datetime.datetime): Дата последнего комментария, None - комментариев нет.
+         `comment_count` и `last_comment_at` обновляются сигналами модели `Comment`, расхождения исправляет
+         команда `recount_comments`.
     """
+    EXCERPT_WORDS = 50
+    COMMENT_STATS_FIELDS = ('comment_count', 'last_comment_at')
+
     title = models.CharField(max_length=200, unique=True)
     content = models.TextField()
     #    status = models.CharField(max_length=10, default="draft", help_text="May be either 'draft' or 'published")
@@ -34,6 +47,10 @@ class Post(models.Model):
     slug = models.SlugField(db_index=True, unique=True)
     last_modified = models.DateTimeField(auto_now=True)
     date_created = models.DateTimeField(auto_now_add=True)
+    excerpt = models.TextField(blank=True, default='', editable=False)
+    search_vector = SearchVectorField(null=True, editable=False)
+    comment_count = models.PositiveIntegerField(default=0, editable=False)
+    last_comment_at = models.DateTimeField(null=True, blank=True, editable=False)
 
     #    pub_date = models.DateTimeField(null=True)
 
@@ -43,6 +60,8 @@ class Post(models.Model):
         ordering = ['-date_created']
         indexes = [
             models.Index(fields=['-date_created'], name='IDX_posts_datecreated'),
+            models.Index(fields=['last_modified'], name='IDX_posts_lastmodified'),
+            models.Index(fields=['-last_comment_at'], name='IDX_posts_lastcommentat'),
         ]
 
     def __str__(self):
@@ -54,6 +73,58 @@ class Post(models.Model):
         """
         return self.title
 
+    def save(self, *args, **kwargs):
+        """
+        Сохраняет пост, пересчитывая `excerpt`, если текст поста загружен.
+
+        Поля `COMMENT_STATS_FIELDS` при обновлении существующего поста не записываются: их меняют только сигналы
+        модели `Comment`, а значения в объекте могли устареть, пока пост редактировался.
+        """
+        deferred_fields = self.get_deferred_fields()
+        update_fields = kwargs.get('update_fields')
+        if update_fields is None and not self._state.adding and not kwargs.get('force_insert'):
+            update_fields = kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.attname not in deferred_fields
+                and field.name not in self.COMMENT_STATS_FIELDS
+            ]
+        if 'content' not in deferred_fields:
+            self.excerpt = self.make_excerpt(self.content)
+            if update_fields is not None and 'content' in update_fields:
+                kwargs['update_fields'] = {*update_fields, 'excerpt'}
+        super().save(*args, **kwargs)
+
+    @classmethod
+    def make_excerpt(cls, content):
+        """
+        Возвращает HTML превью текста поста.
+
+        Результат совпадает с `{{ content|linebreaks|truncatewords:50 }}` в шаблоне.
+
+        Args:
+            content (str): Текст поста.
+
+        Returns:
+            str: Первые `EXCERPT_WORDS` слов текста, разбитые на абзацы.
+        """
+        return truncatewords(linebreaks_filter(content), cls.EXCERPT_WORDS)
+
+    @staticmethod
+    def get_comment_stats():
+        """
+        Возвращает выражения, пересчитывающие `comment_count` и `last_comment_at` по таблице комментариев.
+
+        Используются в `QuerySet.update()`, например, `Post.objects.update(**Post.get_comment_stats())`.
+
+        Returns:
+            dict: Имя поля -> подзапрос по комментариям поста.
+        """
+        comments = Comment.objects.filter(post=OuterRef('pk')).order_by().values('post')
+        return {
+            'comment_count': Coalesce(Subquery(comments.annotate(count=Count('pk')).values('count')), 0),
+            'last_comment_at': Subquery(comments.annotate(latest=Max('date_created')).values('latest')),
+        }
+
     def get_absolute_url(self):
         return reverse("blog:post_detail", kwargs={'slug': self.slug})
 
@@ -101,14 +172,22 @@ class Comment(models.Model):
     Using in:
         - Views: `PostDetailView`.
         - Forms: `AddCommentForm`.
-        - Templates: `blog/post_detail.html`, `blog/comments_tree.html`, `blog/comment_snippet.html`.
+        - Templates: `blog/post_detail.html`, `blog/comment_snippet.html`.
+        - Template tags: `render_comments`.
     Fields:
         - post (Post): Пост, к которому прикрепляется комментарий.
         - author (User): Автор комментария.
         - text (str): Текст комментария.
         - date_created (datetime.datetime): Дата создания комментария.
         - parent_comment (Comment): Указывает на комментарий, к которому сделан комментарий.
+        - path (str): Материализованный путь от корневого комментария ветки. Состоит из сегментов длиной
+         `PATH_STEP` символов, по одному на каждый уровень. Сортировка по `path` даёт ветку в порядке обхода
+         в глубину, новые комментарии на каждом уровне идут первыми.
+        - depth (int): Уровень вложенности комментария (0 - ответ на пост), не больше `MAX_DEPTH`.
     """
+    PATH_STEP = 10
+    MAX_DEPTH = 99
+
     post = models.ForeignKey(Post, on_delete=models.CASCADE, related_name='comments')
     author = models.ForeignKey(User, on_delete=models.CASCADE)
     text = models.CharField(max_length=900)
@@ -117,6 +196,9 @@ class Comment(models.Model):
                                        on_delete=models.CASCADE,
                                        null=True, blank=True,
                                        related_name='child_comments')
+    # Путь самого глубокого комментария (`MAX_DEPTH + 1` сегментов) ровно занимает поле.
+    path = models.CharField(max_length=PATH_STEP * (MAX_DEPTH + 1), blank=True, default='', editable=False)
+    depth = models.PositiveSmallIntegerField(default=0, editable=False)
 
     class Meta:
         verbose_name = 'Комментарий'
@@ -124,6 +206,7 @@ class Comment(models.Model):
         ordering = ['-date_created']
         indexes = [
             models.Index(fields=['-date_created'], name='IDX_comments_datecreated'),
+            models.Index(fields=['post', 'path'], name='IDX_comments_post_path'),
         ]
 
     def __str__(self):
@@ -131,33 +214,165 @@ class Comment(models.Model):
             return f"{self.author}'s comment on {self.parent_comment.author}s comment with pk={self.parent_comment.pk}"
         return f"{self.author}'s comment on '{self.post}'"
 
-    @staticmethod
-    def make_recursive_comments_list(comments, level=0):
+    def save(self, *args, **kwargs):
+        """
+        Сохраняет комментарий и поддерживает актуальными `path` и `depth`.
+
+        Сегмент пути строится из pk, поэтому для нового комментария путь записывается отдельным UPDATE после
+        вставки. Если комментарий перенесён к другому родителю, пути и уровни всей его ветки сдвигаются одним UPDATE.
+
+        Raises:
+            ValueError: Уровень вложенности превышает `MAX_DEPTH` (проверяется до записи, форма проверяет то же
+             самое в `AddCommentForm.clean_parent_comment`).
         """
-        Возвращает рекурсивное дерево комментариев
+        parent_path, parent_depth = '', -1
+        if self.parent_comment_id:
+            parent_path, parent_depth = (Comment.objects.filter(pk=self.parent_comment_id)
+                                         .values_list('path', 'depth').get())
+        depth = parent_depth + 1
+        # При переносе ветки к другому родителю проверяется её самый глубокий комментарий.
+        subtree_depth = 0
+        if self.path and depth > self.depth:
+            subtree_depth = (Comment.objects.filter(post_id=self.post_id, path__startswith=self.path)
+                             .aggregate(depth=Max('depth'))['depth'] - self.depth)
+        if depth + subtree_depth > self.MAX_DEPTH:
+            raise ValueError(f'Уровень вложенности комментария больше {self.MAX_DEPTH}')
+        super().save(*args, **kwargs)
+        path = self.make_path(parent_path, self.pk)
+        if path == self.path and depth == self.depth:
+            return
+        if self.path:
+            (Comment.objects.filter(post_id=self.post_id, path__startswith=self.path, depth__gt=self.depth)
+             .update(path=Concat(Value(path), Substr('path', len(self.path) + 1)),
+                     depth=F('depth') + depth - self.depth))
+        Comment.objects.filter(pk=self.pk).update(path=path, depth=depth)
+        self.path, self.depth = path, depth
 
-        Возвращает список словарей, где каждый словарь содержит сам комментарий, отступ, и его дочерние комментарии.
-        Позволяет в шаблонах построить дерево сообщений.
+    @classmethod
+    def make_path(cls, parent_path, pk):
+        """
+        Возвращает материализованный путь комментария.
+
+        Сегмент - дополнение pk до 10**PATH_STEP, поэтому при сортировке по возрастанию пути более новые
+        комментарии одного уровня идут раньше старых (как и при сортировке по `-date_created`).
 
         Args:
-            comments (QuerySet): QuerySet с комментариями
-            level (int): отступ
+            parent_path (str): Путь родительского комментария, пустая строка для комментария к посту.
+            pk (int): Первичный ключ комментария.
 
         Returns:
-            list: Список словарей с полями 'comment', 'indent' и 'child_comments'
+            str: Путь комментария.
+
+        Raises:
+            ValueError: pk не помещается в сегмент из `PATH_STEP` цифр.
         """
+        if not 0 < pk < 10 ** cls.PATH_STEP:
+            raise ValueError(f'pk комментария {pk} не помещается в сегмент пути из {cls.PATH_STEP} цифр')
+        return f'{parent_path}{10 ** cls.PATH_STEP - 1 - pk:0{cls.PATH_STEP}d}'
+
+
+class PostTerm(models.Model):
+    """
+    Модель PostTerm (Термин поста)
+
+    Инвертированный индекс для полнотекстового поиска на СУБД без встроенного поиска (SQLite). Поиск выбирает
+    строки по индексу `(term, post)` только для слов запроса, поэтому не просматривает всю таблицу постов.
+
+    Using in:
+        - Search: `InvertedIndexSearchBackend`.
+    Fields:
+        - post (Post): Пост, в котором встречается термин.
+        - term (str): Нормализованное слово (см. `blog.search.tokenize`).
+        - weight (int): Вес термина в посте: кол-во вхождений в текст плюс `TITLE_WEIGHT` за каждое вхождение в
+         заголовок.
+    """
+    post = models.ForeignKey(Post, on_delete=models.CASCADE, related_name='terms')
+    term = models.CharField(max_length=100)
+    weight = models.PositiveIntegerField()
+
+    class Meta:
+        verbose_name = 'Термин поста'
+        verbose_name_plural = 'Термины постов'
+        constraints = [
+            models.UniqueConstraint(fields=['term', 'post'], name='UNQ_post_terms_term_post'),
+        ]
 
-        def recursive_builder(comment, level):
-            result = {
-                'comment': comment,
-                'indent': level * 1,
-                'child_comments': []
-            }
-            for child in comment.child_comments.all():
-                result['child_comments'].append(recursive_builder(child, level + 1))
-            return result
-
-        tree = []
-        for comment in comments.filter(parent_comment=None):
-            tree.append(recursive_builder(comment, level))
-        return tree
+    def __str__(self):
+        return f'{self.term} ({self.post_id})'
+
+
+class BootstrapStamp(models.Model):
+    """
+    Модель BootstrapStamp (Отметка инициализации)
+
+    Хранит отпечаток данных, уже загруженных в БД при старте контейнера, чтобы не повторять загрузку.
+
+    Using in:
+        - Commands: `bootstrap`.
+    Fields:
+        - name (str): Имя шага инициализации (например, `fixture:db_data`).
+        - fingerprint (str): Хеш загруженных данных.
+        - date_applied (datetime.datetime): Дата выполнения шага.
+    """
+    name = models.CharField(max_length=100, unique=True)
+    fingerprint = models.CharField(max_length=64)
+    date_applied = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = 'Отметка инициализации'
+        verbose_name_plural = 'Отметки инициализации'
+
+    def __str__(self):
+        return self.name
+
+
+class ImportedPost(models.Model):
+    """
+    Модель ImportedPost (Импортированный пост)
+
+    Отмечает посты, созданные `import_posts`. Комментарии из архива добавляются только к таким постам, а не к
+    постам сайта с тем же `slug`, в том числе при повторном запуске после прерванного импорта.
+
+    Using in:
+        - Commands: `import_posts`.
+    Fields:
+        - post (Post): Созданный импортом пост.
+    """
+    post = models.OneToOneField(Post, on_delete=models.CASCADE, primary_key=True, related_name='import_record')
+
+    class Meta:
+        verbose_name = 'Импортированный пост'
+        verbose_name_plural = 'Импортированные посты'
+
+    def __str__(self):
+        return str(self.post_id)
+
+
+class ImportedComment(models.Model):
+    """
+    Модель ImportedComment (Импортированный комментарий)
+
+    Соответствие `id` комментария в архиве `export_posts` комментарию, созданному `import_posts`. По нему импорт
+    находит родительские комментарии из предыдущих пачек и при повторном запуске пропускает уже загруженные
+    комментарии.
+
+    Using in:
+        - Commands: `import_posts`.
+    Fields:
+        - post (Post): Пост комментария.
+        - archive_id (int): `id` комментария в архиве.
+        - comment (Comment): Созданный импортом комментарий.
+    """
+    post = models.ForeignKey(Post, on_delete=models.CASCADE, related_name='+')
+    archive_id = models.PositiveBigIntegerField()
+    comment = models.OneToOneField(Comment, on_delete=models.CASCADE, related_name='import_record')
+
+    class Meta:
+        verbose_name = 'Импортированный комментарий'
+        verbose_name_plural = 'Импортированные комментарии'
+        constraints = [
+            models.UniqueConstraint(fields=['post', 'archive_id'], name='UNQ_imported_comments_post_archive_id'),
+        ]
+
+    def __str__(self):
+        return f'{self.archive_id} ({self.post_id})'
@@ -0,0 +1,66 @@
+import hashlib
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import parse_http_date_safe, urlencode
+
+GENERATION_KEY = 'blog:page_generation'
+KEY_PREFIX = 'blog:page'
+CACHED_HEADERS = ['Content-Type', 'ETag', 'Last-Modified']
+
+
+def is_anonymous_request(request):
+    """
+    Возвращает True, если у запроса нет cookie сессии.
+
+    Проверяется только cookie, без загрузки сессии и пользователя: запрос без сессии гарантированно анонимный.
+    Те же условия использует `proxy_cache` в `nginx/nginx.conf`.
+    """
+    return settings.SESSION_COOKIE_NAME not in request.COOKIES
+
+
+def get_generation():
+    """Возвращает текущее поколение кеша страниц."""
+    generation = cache.get(GENERATION_KEY)
+    if generation is None:
+        cache.add(GENERATION_KEY, 1, None)
+        generation = cache.get(GENERATION_KEY, 1)
+    return generation
+
+
+def invalidate_pages():
+    """
+    Сбрасывает кеш страниц, увеличивая поколение.
+
+    Ключи страниц включают поколение, поэтому страницы прошлых поколений больше не читаются и вытесняются
+    из кеша по таймауту.
+    """
+    try:
+        cache.incr(GENERATION_KEY)
+    except ValueError:
+        cache.add(GENERATION_KEY, 1, None)
+
+
+def make_page_key(request):
+    """Возвращает ключ страницы: поколение, адрес страницы и параметры запроса в отсортированном порядке."""
+    parts = [get_generation(), settings.BLOG_ETAG_VERSION, request.method == 'HEAD', request.get_host(),
+             request.path, urlencode(sorted(request.GET.lists()), doseq=True)]
+    return f'{KEY_PREFIX}:{hashlib.md5(repr(parts).encode(), usedforsecurity=False).hexdigest()}'
+
+
+def store_page(key, response):
+    """Кеширует тело и заголовки ответа с кодом 200 на `settings.BLOG_PAGE_CACHE_TIMEOUT` секунд."""
+    if response.status_code == 200 and not response.streaming:
+        headers = {name: response[name] for name in CACHED_HEADERS if response.has_header(name)}
+        cache.set(key, (response.content, headers), settings.BLOG_PAGE_CACHE_TIMEOUT)
+
+
+def make_page_response(request, cached):
+    """Возвращает ответ из закешированной страницы или `304 Not Modified` по её `ETag` / `Last-Modified`."""
+    content, headers = cached
+    response = HttpResponse(content, headers=headers)
+    return get_conditional_response(request, etag=headers.get('ETag'),
+                                    last_modified=parse_http_date_safe(headers.get('Last-Modified', '')),
+                                    response=response)
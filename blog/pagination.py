@@ -0,0 +1,272 @@
+from datetime import datetime
+
+from django.core.paginator import InvalidPage, Paginator
+from django.db.models import Case, Exists, OuterRef, Value, When
+from django.utils.functional import cached_property
+from django.utils.http import urlsafe_base64_decode, urlsafe_base64_encode
+
+
+class CountedPaginator(Paginator):
+    """
+    Пагинатор с заранее известным количеством записей.
+
+    Количество передаётся снаружи (например, из счётчика постов), поэтому пагинатор и
+    `get_elided_page_range` не выполняют `COUNT(*)`. Если количество не передано, считается как обычно.
+
+    Using in:
+        - Views: `FeedView`, `PostsView`.
+    """
+
+    def __init__(self, object_list, per_page, count=None, **kwargs):
+        super().__init__(object_list, per_page, **kwargs)
+        self._count = count
+
+    @cached_property
+    def count(self):
+        if self._count is None:
+            return super().count
+        return self._count
+
+
+class CursorPage:
+    """
+    Страница курсорной пагинации.
+
+    В отличие от `django.core.paginator.Page` не знает ни номера страницы, ни общего количества страниц -
+    только есть ли записи до и после неё и курсоры для перехода к ним.
+
+    Using in:
+        - Paginators: `CursorPaginator`.
+        - Templates: `blog/pagination.html`.
+
+    Attributes:
+        - object_list (list): Записи страницы.
+        - paginator (CursorPaginator): Пагинатор, создавший страницу.
+        - next_cursor (str): Курсор для перехода к следующей (более старой) странице.
+        - previous_cursor (str): Курсор для перехода к предыдущей (более новой) странице.
+    """
+
+    def __init__(self, object_list, paginator, has_next, has_previous):
+        self.object_list = object_list
+        self.paginator = paginator
+        self._has_next = has_next
+        self._has_previous = has_previous
+        self.next_cursor = paginator.encode_cursor(object_list[-1]) if has_next else None
+        self.previous_cursor = paginator.encode_cursor(object_list[0]) if has_previous else None
+
+    def __repr__(self):
+        return f'<Cursor page of {len(self.object_list)} objects>'
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def has_next(self):
+        return self._has_next
+
+    def has_previous(self):
+        return self._has_previous
+
+    def has_other_pages(self):
+        return self._has_next or self._has_previous
+
+
+class CursorPaginator:
+    """
+    Курсорная (keyset) пагинация по `(date_created, id)` в порядке убывания.
+
+    Страница выбирается условием по ключу последней показанной записи, а не смещением, поэтому не нужен
+    `COUNT(*)`, а запрос любой страницы использует индекс `IDX_posts_datecreated` и стоит столько же,
+    сколько запрос первой. Для определения наличия следующей страницы запрашивается одна лишняя запись.
+
+    Using in:
+        - Views: `FeedView`, `PostsView`.
+
+    Attributes:
+        - object_list (QuerySet): Записи для разбиения на страницы.
+        - per_page (int): Кол-во записей на одну страницу.
+    """
+
+    def __init__(self, object_list, per_page):
+        self.object_list = object_list
+        self.per_page = int(per_page)
+
+    @staticmethod
+    def encode_cursor(obj):
+        """Возвращает курсор, указывающий на запись `obj`."""
+        return urlsafe_base64_encode(f'{obj.date_created.isoformat()}|{obj.pk}'.encode())
+
+    @staticmethod
+    def decode_cursor(cursor):
+        """
+        Разбирает курсор.
+
+        Raises:
+            InvalidPage: Если курсор повреждён.
+
+        Returns:
+            tuple: Пара `(date_created, pk)`.
+        """
+        try:
+            date_created, pk = urlsafe_base64_decode(cursor).decode().split('|')
+            return datetime.fromisoformat(date_created), int(pk)
+        except ValueError:
+            raise InvalidPage('Неверный курсор')
+
+    def get_page_queryset(self, after=None, before=None):
+        """Возвращает запрос записей страницы (с одной лишней записью) после `after` или перед `before`."""
+        queryset = self.object_list
+        if before:
+            date_created, pk = self.decode_cursor(before)
+            queryset = (queryset.filter(date_created__gte=date_created)
+                        .exclude(date_created=date_created, pk__lte=pk)
+                        .order_by('date_created', 'pk'))
+        elif after:
+            date_created, pk = self.decode_cursor(after)
+            queryset = (queryset.filter(date_created__lte=date_created)
+                        .exclude(date_created=date_created, pk__gte=pk)
+                        .order_by('-date_created', '-pk'))
+        else:
+            queryset = queryset.order_by('-date_created', '-pk')
+        return queryset[:self.per_page + 1]
+
+    def make_page(self, object_list, after=None, before=None):
+        """Создаёт страницу из записей, полученных запросом `get_page_queryset`."""
+        has_more = len(object_list) > self.per_page
+        object_list = object_list[:self.per_page]
+        if before:
+            object_list.reverse()
+            return CursorPage(object_list, self, has_next=bool(object_list), has_previous=has_more)
+        return CursorPage(object_list, self, has_next=has_more, has_previous=bool(after and object_list))
+
+    def page(self, after=None, before=None):
+        """
+        Возвращает страницу записей после курсора `after` или перед курсором `before`.
+
+        Без курсоров возвращается первая страница.
+
+        Args:
+            after (str): Курсор последней записи предыдущей страницы.
+            before (str): Курсор первой записи следующей страницы.
+
+        Returns:
+            CursorPage: Страница записей.
+        """
+        object_list = list(self.get_page_queryset(after, before))
+        return self.make_page(object_list, after, before)
+
+    async def apage(self, after=None, before=None):
+        """Асинхронная версия `page`."""
+        object_list = [obj async for obj in self.get_page_queryset(after, before)]
+        return self.make_page(object_list, after, before)
+
+
+class CommentChunk:
+    """
+    Порция ветки комментариев.
+
+    Using in:
+        - Paginators: `CommentThreadPaginator`.
+        - Templates: `blog/comments_chunk.html`.
+
+    Attributes:
+        - object_list (list): Комментарии порции в порядке обхода в глубину.
+        - base_depth (int): Уровень комментариев верхнего уровня ветки.
+        - parent (Comment): Комментарий, ответы на который составляют ветку, None - ветка всего поста.
+        - next_cursor (str): Курсор для загрузки следующей порции, None - порция последняя.
+    """
+
+    def __init__(self, object_list, base_depth, parent, next_cursor):
+        self.object_list = object_list
+        self.base_depth = base_depth
+        self.parent = parent
+        self.next_cursor = next_cursor
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+
+class CommentThreadPaginator:
+    """
+    Порционная загрузка ветки комментариев по материализованному пути (`Comment.path`).
+
+    Порция - следующие `per_page` комментариев ветки в порядке обхода в глубину после курсора (пути последнего
+    показанного комментария), поэтому размер страницы ограничен при любом количестве комментариев, а запрос любой
+    порции использует индекс `IDX_comments_post_path`. Показываются только `max_depth` уровней ветки: у
+    комментариев последнего уровня аннотируется `has_hidden_replies`, их ответы загружаются отдельной веткой
+    с `parent`.
+
+    Using in:
+        - Views: `PostDetailView`, `comments_fragment_view`.
+
+    Attributes:
+        - comments (QuerySet): Комментарии поста.
+        - per_page (int): Кол-во комментариев в порции.
+        - max_depth (int): Кол-во уровней ветки, загружаемых сразу.
+        - parent (Comment): Комментарий, ответы на который загружаются, None - ветка всего поста.
+    """
+
+    def __init__(self, comments, per_page, max_depth, parent=None):
+        self.comments = comments
+        self.per_page = int(per_page)
+        self.max_depth = int(max_depth)
+        self.parent = parent
+        self.base_depth = parent.depth + 1 if parent is not None else 0
+
+    def validate_cursor(self, cursor):
+        """
+        Проверяет курсор.
+
+        Raises:
+            InvalidPage: Если курсор не является путём комментария.
+        """
+        step = self.comments.model.PATH_STEP
+        if not cursor.isdigit() or len(cursor) % step:
+            raise InvalidPage('Неверный курсор')
+        return cursor
+
+    def get_chunk_queryset(self, after=None):
+        """Возвращает запрос комментариев порции (с одним лишним комментарием) после курсора `after`."""
+        model = self.comments.model
+        last_depth = self.base_depth + self.max_depth - 1
+        queryset = self.comments.filter(depth__lte=last_depth)
+        if self.parent is not None:
+            queryset = queryset.filter(path__startswith=self.parent.path, depth__gte=self.base_depth)
+        if after:
+            queryset = queryset.filter(path__gt=self.validate_cursor(after))
+        has_replies = Exists(model.objects.filter(parent_comment=OuterRef('pk')))
+        queryset = queryset.annotate(
+            has_hidden_replies=Case(When(depth=last_depth, then=has_replies), default=Value(False)))
+        return queryset.order_by('path')[:self.per_page + 1]
+
+    def make_chunk(self, object_list):
+        """Создаёт порцию из комментариев, полученных запросом `get_chunk_queryset`."""
+        next_cursor = None
+        if len(object_list) > self.per_page:
+            object_list = object_list[:self.per_page]
+            next_cursor = object_list[-1].path
+        return CommentChunk(object_list, self.base_depth, self.parent, next_cursor)
+
+    def chunk(self, after=None):
+        """
+        Возвращает порцию комментариев после курсора `after`.
+
+        Args:
+            after (str): Курсор (`CommentChunk.next_cursor`) предыдущей порции, None - первая порция.
+
+        Returns:
+            CommentChunk: Порция комментариев.
+        """
+        return self.make_chunk(list(self.get_chunk_queryset(after)))
+
+    async def achunk(self, after=None):
+        """Асинхронная версия `chunk`."""
+        return self.make_chunk([comment async for comment in self.get_chunk_queryset(after)])
@@ -0,0 +1,106 @@
+import re
+from collections import Counter
+
+from django.conf import settings
+from django.contrib.postgres.search import SearchQuery, SearchRank, SearchVector
+from django.db import connections, router, transaction
+from django.db.models import Count, F, Sum
+
+from .models import Post, PostTerm
+
+WORD_RE = re.compile(r'\w+')
+MAX_QUERY_TERMS = 10
+
+
+def tokenize(text):
+    """
+    Разбивает текст на нормализованные слова для `PostTerm`.
+
+    Слова приводятся к нижнему регистру, 'ё' заменяется на 'е', однобуквенные слова отбрасываются.
+    Морфология не учитывается: "пост" и "посты" - разные термины.
+    """
+    text = text.lower().replace('ё', 'е')
+    return [word[:PostTerm._meta.get_field('term').max_length] for word in WORD_RE.findall(text) if len(word) > 1]
+
+
+class InvertedIndexSearchBackend:
+    """
+    Полнотекстовый поиск по инвертированному индексу `PostTerm` (SQLite и другие СУБД без встроенного поиска).
+
+    Находит посты, содержащие все слова запроса, ранжирует по сумме весов слов. Используется, чтобы поиск
+    работал и тестировался без PostgreSQL.
+
+    Using in:
+        - Views: `SearchView`, `search_api_view` (через `get_search_backend`).
+        - Signals: `index_post`.
+    """
+    TITLE_WEIGHT = 4
+
+    def get_terms(self, post):
+        weights = Counter(tokenize(post.content))
+        for term in tokenize(post.title):
+            weights[term] += self.TITLE_WEIGHT
+        return [PostTerm(post=post, term=term, weight=weight) for term, weight in weights.items()]
+
+    def index(self, post):
+        """Перестраивает термины поста `post`."""
+        with transaction.atomic():
+            PostTerm.objects.filter(post=post).delete()
+            PostTerm.objects.bulk_create(self.get_terms(post))
+
+    def index_many(self, posts):
+        """Строит термины новых постов `posts` (например, созданных `bulk_create`) одним `bulk_create`."""
+        PostTerm.objects.bulk_create([term for post in posts for term in self.get_terms(post)], batch_size=1000)
+
+    def search(self, query):
+        """
+        Возвращает посты, подходящие под запрос `query`.
+
+        Returns:
+            QuerySet: Посты с аннотацией `rank`, упорядоченные по убыванию релевантности.
+        """
+        terms = set(tokenize(query)[:MAX_QUERY_TERMS])
+        if not terms:
+            return Post.objects.none()
+        return (Post.objects.filter(terms__term__in=terms)
+                .annotate(rank=Sum('terms__weight'), matched_terms=Count('terms'))
+                .filter(matched_terms=len(terms))
+                .order_by('-rank', '-date_created'))
+
+
+class PostgresSearchBackend:
+    """
+    Полнотекстовый поиск PostgreSQL по `Post.search_vector` с GIN-индексом.
+
+    Вектор строится из заголовка (вес A) и текста (вес B) с конфигурацией `settings.BLOG_SEARCH_CONFIG`,
+    запрос разбирается как `websearch_to_tsquery` (поддерживает "фразы", `or` и `-исключения`), результаты
+    ранжируются `ts_rank`.
+    """
+
+    def __init__(self):
+        self.config = settings.BLOG_SEARCH_CONFIG
+
+    def get_vector(self):
+        return (SearchVector('title', weight='A', config=self.config)
+                + SearchVector('content', weight='B', config=self.config))
+
+    def index(self, post):
+        Post.objects.filter(pk=post.pk).update(search_vector=self.get_vector())
+
+    def index_many(self, posts):
+        Post.objects.filter(pk__in=[post.pk for post in posts]).update(search_vector=self.get_vector())
+
+    def search(self, query):
+        if not query.strip():
+            return Post.objects.none()
+        search_query = SearchQuery(query, search_type='websearch', config=self.config)
+        return (Post.objects.filter(search_vector=search_query)
+                .annotate(rank=SearchRank(F('search_vector'), search_query))
+                .order_by('-rank', '-date_created'))
+
+
+def get_search_backend():
+    """Возвращает поисковый бэкенд для СУБД, в которой хранятся посты."""
+    if connections[router.db_for_write(Post)].vendor == 'postgresql':
+        return PostgresSearchBackend()
+    return InvertedIndexSearchBackend()
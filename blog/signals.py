@@ -0,0 +1,117 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import transaction
+from django.db.backends.signals import connection_created
+from django.db.models import F, QuerySet, Value
+from django.db.models.functions import Coalesce, Greatest
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .backends import CachedModelBackend
+from .counters import get_post_counter
+from .middleware import track_queries
+from .models import Comment, Post
+from .page_cache import invalidate_pages
+from .search import get_search_backend
+
+
+@receiver(connection_created)
+def track_connection_queries(sender, connection, **kwargs):
+    """Подключает к новому соединению учёт запросов `PerformanceMiddleware` (один раз на соединение)."""
+    if track_queries not in connection.execute_wrappers:
+        connection.execute_wrappers.append(track_queries)
+
+
+@receiver(post_save, sender=Post)
+def count_created_post(sender, instance, created, **kwargs):
+    """Увеличивает счётчики постов при создании поста."""
+    if created:
+        get_post_counter().adjust(instance.author_id, 1)
+
+
+@receiver(post_delete, sender=Post)
+def count_deleted_post(sender, instance, **kwargs):
+    """Уменьшает счётчики постов при удалении поста."""
+    get_post_counter().adjust(instance.author_id, -1)
+
+
+@receiver(post_save, sender=Post)
+def index_post(sender, instance, update_fields=None, **kwargs):
+    """Обновляет поисковый индекс поста, если могли измениться заголовок или текст."""
+    if update_fields is not None and not {'title', 'content'} & set(update_fields):
+        return
+    get_search_backend().index(instance)
+
+
+@receiver(post_save, sender=Comment)
+def count_created_comment(sender, instance, created, raw=False, **kwargs):
+    """
+    Увеличивает `comment_count` поста и сдвигает `last_comment_at` при создании комментария.
+
+    Фикстуры (`raw`) уже содержат значения счётчиков постов.
+    """
+    if not created or raw:
+        return
+    date_created = Value(instance.date_created)
+    Post.objects.filter(pk=instance.post_id).update(
+        comment_count=F('comment_count') + 1,
+        last_comment_at=Greatest(Coalesce('last_comment_at', date_created), date_created),
+    )
+
+
+def is_cascade_row(instance, origin):
+    """
+    Возвращает True, если `instance` удаляется каскадом вместе с постом (постами `QuerySet.delete()`) или
+    комментарием `origin`.
+
+    Такие строки не обрабатываются по одной: удаляемый пост или корень ветки комментариев получает свой
+    `post_delete` и обрабатывает удаление целиком.
+    """
+    if isinstance(origin, QuerySet):
+        return origin.model is Post and isinstance(instance, Comment)
+    return isinstance(origin, (Post, Comment)) and origin is not instance
+
+
+@receiver(post_delete, sender=Comment)
+def count_deleted_comment(sender, instance, origin=None, **kwargs):
+    """
+    Обновляет `comment_count` и `last_comment_at` поста при удалении комментария.
+
+    При удалении поста его комментарии не пересчитываются. Комментарий, удалённый методом `delete()`, пересчитывает
+    пост одним UPDATE вместе со всей своей веткой (к моменту сигнала удалена и она), ответы ветки пропускаются.
+    Остальные удаления (`QuerySet.delete()`, каскад от пользователя) уменьшают счётчик на каждую строку.
+    """
+    if is_cascade_row(instance, origin):
+        return
+    if origin is instance:
+        Post.objects.filter(pk=instance.post_id).update(**Post.get_comment_stats())
+        return
+    Post.objects.filter(pk=instance.post_id).update(
+        comment_count=Greatest(F('comment_count') - 1, Value(0)),
+        last_comment_at=Post.get_comment_stats()['last_comment_at'],
+    )
+
+
+@receiver(post_save, sender=get_user_model())
+@receiver(post_delete, sender=get_user_model())
+def invalidate_cached_user(sender, instance, **kwargs):
+    """Удаляет пользователя из кеша `CachedModelBackend` при изменении и удалении."""
+    cache.delete(CachedModelBackend.make_key(instance.pk))
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+def invalidate_cached_pages(sender, instance, origin=None, **kwargs):
+    """
+    Сбрасывает кеш страниц (`PageCacheMixin`) при изменении постов и комментариев.
+
+    Поколение увеличивается сразу и ещё раз после фиксации транзакции: иначе параллельный запрос мог бы
+    закешировать страницу с данными до фиксации под уже новым поколением. Каскадно удаляемые комментарии
+    поколение не меняют, его сбрасывает сигнал удаляемого поста или корня ветки.
+    """
+    if is_cascade_row(instance, origin):
+        return
+    invalidate_pages()
+    transaction.on_commit(invalidate_pages)
@@ -0,0 +1,142 @@
+import hashlib
+from xml.sax.saxutils import escape
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db.models import Count, F, Max
+from django.urls import reverse
+
+from .feeds import cached_stream
+from .models import Post
+
+SITEMAP_NS = 'http://www.sitemaps.org/schemas/sitemap/0.9'
+
+
+def format_lastmod(value):
+    return value.isoformat(timespec='seconds')
+
+
+class SitemapSection:
+    """
+    Раздел карты сайта, разбитый на шарды по диапазонам первичного ключа.
+
+    Шард `n` содержит объекты с pk от `n * shard_size + 1` до `(n + 1) * shard_size`, поэтому в шарде не больше
+    `shard_size` адресов (лимит протокола - 50 000), а границы шардов не сдвигаются при добавлении и удалении
+    объектов. Изменение объектов меняет дату и количество только своего шарда, поэтому закешированные XML
+    остальных шардов остаются действительными.
+
+    Using in:
+        - Views: `sitemap_index_view`, `sitemap_section_view`.
+
+    Attributes:
+        - name (str): Имя раздела в адресе шарда.
+        - lastmod_field (str): Поле (в том числе связанной модели) с датой изменения адреса.
+        - chunk_size (int): Кол-во строк, читаемых из БД за раз и отдаваемых одной частью ответа.
+    """
+    name = None
+    lastmod_field = None
+    chunk_size = 2000
+    key_prefix = 'blog:sitemap'
+
+    def __init__(self, request):
+        self.request = request
+        self.shard_size = settings.BLOG_SITEMAP_SHARD_SIZE
+
+    def get_queryset(self):
+        raise NotImplementedError
+
+    def get_rows(self, queryset):
+        """Возвращает пары (адрес, дата изменения) в порядке pk."""
+        raise NotImplementedError
+
+    def get_shards(self):
+        """
+        Возвращает непустые шарды раздела одним запросом.
+
+        Returns:
+            list: Словари с номером шарда `shard`, датой последнего изменения `lastmod` и кол-вом адресов `count`.
+        """
+        return list(self.get_queryset()
+                    .annotate(shard=(F('pk') - 1) / self.shard_size)
+                    .values('shard')
+                    .annotate(lastmod=Max(self.lastmod_field), count=Count('pk', distinct=True))
+                    .order_by('shard'))
+
+    def get_shard_queryset(self, shard):
+        return self.get_queryset().filter(pk__gt=shard * self.shard_size, pk__lte=(shard + 1) * self.shard_size)
+
+    def get_validators(self, shard):
+        """Возвращает дату последнего изменения и кол-во адресов шарда `shard` одним запросом."""
+        aggregates = self.get_shard_queryset(shard).aggregate(lastmod=Max(self.lastmod_field),
+                                                              count=Count('pk', distinct=True))
+        return aggregates['lastmod'], aggregates['count']
+
+    def make_key(self, shard, validators):
+        parts = [self.name, shard, self.shard_size, self.request.get_host(), *validators]
+        return f'{self.key_prefix}:{hashlib.md5(repr(parts).encode(), usedforsecurity=False).hexdigest()}'
+
+    def generate(self, shard):
+        buffer = [f'<?xml version="1.0" encoding="UTF-8"?>\n<urlset xmlns="{SITEMAP_NS}">\n']
+        for location, lastmod in self.get_rows(self.get_shard_queryset(shard)):
+            buffer.append(f'<url><loc>{escape(location)}</loc><lastmod>{format_lastmod(lastmod)}</lastmod></url>\n')
+            if len(buffer) >= self.chunk_size:
+                yield ''.join(buffer)
+                buffer = []
+        buffer.append('</urlset>\n')
+        yield ''.join(buffer)
+
+    def stream(self, shard, validators):
+        """Генерирует XML шарда из кеша или из БД (см. `cached_stream`)."""
+        return cached_stream(self.make_key(shard, validators), lambda: self.generate(shard),
+                             settings.BLOG_SITEMAP_CACHE_TIMEOUT)
+
+
+class PostSitemapSection(SitemapSection):
+    """Страницы постов (`blog:post_detail`)."""
+    name = 'posts'
+    lastmod_field = 'last_modified'
+
+    def get_queryset(self):
+        return Post.objects.all()
+
+    def get_rows(self, queryset):
+        # Адрес строится по шаблону один раз: reverse на каждую из десятков тысяч строк заметно дороже.
+        prefix, suffix = self.request.build_absolute_uri(reverse('blog:post_detail', args=['__slug__'])) \
+            .split('__slug__')
+        rows = queryset.order_by('pk').values_list('slug', 'last_modified').iterator(chunk_size=self.chunk_size)
+        for slug, last_modified in rows:
+            yield f'{prefix}{slug}{suffix}', last_modified
+
+
+class AuthorSitemapSection(SitemapSection):
+    """Страницы авторов (`blog:posts_list`), у которых есть посты. Дата изменения - дата изменения их постов."""
+    name = 'authors'
+    lastmod_field = 'post__last_modified'
+
+    def get_queryset(self):
+        return User.objects.filter(post__isnull=False)
+
+    def get_rows(self, queryset):
+        rows = (queryset.values('pk').annotate(lastmod=Max('post__last_modified')).order_by('pk')
+                .values_list('username', 'lastmod').iterator(chunk_size=self.chunk_size))
+        for username, lastmod in rows:
+            yield self.request.build_absolute_uri(reverse('blog:posts_list', args=[username])), lastmod
+
+
+SECTIONS = {section.name: section for section in [PostSitemapSection, AuthorSitemapSection]}
+
+
+def render_sitemap_index(request):
+    """
+    Возвращает XML индекса карты сайта: по одной записи на непустой шард каждого раздела.
+
+    Индекс строится по запросу на раздел (`SitemapSection.get_shards`), без чтения самих объектов.
+    """
+    parts = [f'<?xml version="1.0" encoding="UTF-8"?>\n<sitemapindex xmlns="{SITEMAP_NS}">\n']
+    for name, section_class in SECTIONS.items():
+        for shard in section_class(request).get_shards():
+            location = request.build_absolute_uri(reverse('blog:sitemap_section', args=[name, shard['shard']]))
+            parts.append(f'<sitemap><loc>{escape(location)}</loc>'
+                         f'<lastmod>{format_lastmod(shard["lastmod"])}</lastmod></sitemap>\n')
+    parts.append('</sitemapindex>\n')
+    return ''.join(parts)
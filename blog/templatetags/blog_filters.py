@@ -1,8 +1,96 @@
+from html import escape
+
 from django import template
+from django.conf import settings
+from django.template.backends.utils import csrf_input
+from django.urls import reverse
+from django.utils.http import urlencode
+from django.utils.safestring import mark_safe
 
 register = template.Library()
 
+COMMENT_INDENT = '&SmallCircle;'
+COMMENT_START = '<article class="single-comment">\n    <p>'
+COMMENT_TEXT_END = '</p>\n'
+COMMENT_END = '</article>\n'
+HIDDEN_REPLIES_HTML = '<div class="comment-child"><a href="{url}" class="load-comments">Показать ответы</a></div>\n'
+REPLY_FORM_HTML = '''    <label for="reply-comment-button{pk}" class="mini-label">Ответить</label>
+    <input type="checkbox" id="reply-comment-button{pk}">
+    <div class="appear">
+        <form method="post">
+            {form}
+            <input type="hidden" name="parent_comment" value="{pk}">
+            <button type="submit" class="button">Ответить</button>
+        </form>
+    </div>
+'''
+
+
+@register.simple_tag(takes_context=True)
+def render_comments(context, comments, base_depth=0, replies_url=None):
+    """
+    Рендерит ветку комментариев за один проход.
+
+    Комментарии передаются плоским списком в порядке обхода в глубину (упорядоченные по `Comment.path`), уровень
+    вложенности берётся из `Comment.depth`. Ответы оборачиваются в `<div class="comment-child">`: при переходе на
+    уровень глубже блок открывается, при возврате - закрывается. Строка отступа строится один раз на уровень,
+    форма ответа (CSRF-токен и `form` из контекста) рендерится один раз на страницу, разбивается по месту pk
+    комментария и показывается только авторизованным пользователям. Для каждого комментария в результат
+    добавляются только готовые куски разметки, без форматирования больших строк.
+
+    После комментариев с аннотацией `has_hidden_replies` (см. `CommentThreadPaginator`) выводится ссылка на
+    загрузку их ответов: `replies_url` с параметром `parent`.
+
+    Args:
+        comments (Iterable): Комментарии, упорядоченные по `path`.
+        base_depth (int): Уровень комментариев верхнего уровня ветки (для рендеринга поддерева). Вложенность
+         блоков считается от него, отступ - от абсолютного уровня комментария.
+        replies_url (str): Адрес загрузки ответов (`blog:comments_fragment`).
+
+    Пример:
+        {% render_comments comments %}
+    """
+    reply_parts = None
+    user = context.get('user')
+    if user is not None and user.is_authenticated:
+        form = csrf_input(context['request']) + str(context['form'])
+        reply_parts = REPLY_FORM_HTML.replace('{form}', form).split('{pk}')
+    indents = []
+    parts = []
+    open_branches = 0
+    for comment in comments:
+        depth = comment.depth - base_depth
+        if depth > open_branches:
+            parts.append('<div class="comment-child">' * (depth - open_branches))
+        elif depth < open_branches:
+            parts.append('</div>' * (open_branches - depth))
+        open_branches = depth
+        while len(indents) <= comment.depth:
+            indents.append(COMMENT_INDENT * len(indents) + ' ')
+        parts += (COMMENT_START, indents[comment.depth], escape(comment.text), COMMENT_TEXT_END)
+        if reply_parts:
+            pk = str(comment.pk)
+            for part in reply_parts[:-1]:
+                parts += (part, pk)
+            parts.append(reply_parts[-1])
+        parts.append(COMMENT_END)
+        if replies_url and getattr(comment, 'has_hidden_replies', False):
+            parts.append(HIDDEN_REPLIES_HTML.format(url=escape(f'{replies_url}?{urlencode({"parent": comment.pk})}')))
+    parts.append('</div>' * open_branches)
+    return mark_safe(''.join(parts))
+
+
+@register.simple_tag(takes_context=True)
+def header_user(context):
+    """
+    Выводит блок пользователя в шапке страницы (`blog/header_user.html`).
+
+    При `settings.BLOG_HEADER_SSI` вместо блока выводится SSI-вставка `blog:header_fragment`: nginx подставляет
+    блок для каждого запроса, поэтому остальная страница одинакова для всех пользователей и кешируется целиком.
 
-@register.filter
-def mul(value, arg):
-    return value * arg
+    Пример:
+        {% header_user %}
+    """
+    if settings.BLOG_HEADER_SSI:
+        return mark_safe(f'<!--# include virtual="{reverse("blog:header_fragment")}" -->')
+    return context.template.engine.get_template('blog/header_user.html').render(context)
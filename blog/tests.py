@@ -1,3 +1,808 @@
-from django.test import TestCase
+import importlib
+import json
+import os
+import subprocess
+import sys
+import tempfile
+from contextlib import contextmanager
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import async_to_sync, iscoroutinefunction
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection, connections, transaction
+from django.http import HttpResponse
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import clear_url_caches, reverse
+
+from .backends import CachedModelBackend
+from .counters import get_post_counter
+from .middleware import PerformanceMiddleware, QueryBudgetExceeded, ReplicaPinningMiddleware, stats
+from .models import BootstrapStamp, Comment, Post
+from .views import AsyncFeedView, AsyncPostDetailView, AsyncPostsView, FeedView, SearchView
+
+
+class FeedQueriesTest(TestCase):
+    """Количество запросов страниц со списками постов не зависит от количества постов на странице."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.users = [User.objects.create_user(username=f'user{i}') for i in range(3)]
+        for i in range(30):
+            Post.objects.create(title=f'Пост {i}', slug=f'post-{i}', content='Текст поста', author=cls.users[i % 3])
+
+    def setUp(self):
+        cache.clear()
+
+    def assertConstantQueries(self, url, num):
+        for paginate_by in (2, 5, 10):
+            cache.clear()
+            with self.subTest(paginate_by=paginate_by), mock.patch.object(FeedView, 'paginate_by', paginate_by):
+                with self.assertNumQueries(num):
+                    response = self.client.get(url)
+                self.assertEqual(len(response.context['object_list']), paginate_by)
+
+    def test_feed_page(self):
+        # Валидаторы ETag, COUNT(*) для пагинатора и выборка постов вместе с авторами.
+        self.assertConstantQueries(reverse('blog:feed_page'), 3)
+
+    def test_posts_list(self):
+        # Валидаторы ETag, пользователь, COUNT(*) его постов и выборка постов.
+        self.assertConstantQueries(reverse('blog:posts_list', args=[self.users[0].username]) + '?page=1', 4)
+
+    @override_settings(BLOG_PAGINATION_MODE='cursor')
+    def test_feed_page_cursor(self):
+        # Валидаторы ETag (последнее изменение и количество постов из счётчика) и выборка постов.
+        self.assertConstantQueries(reverse('blog:feed_page'), 3)
+
+
+class CachedPostCounterTest(TestCase):
+    """Закешированное количество постов меняется только после фиксации транзакции."""
+
+    def test_adjust_on_commit(self):
+        user = User.objects.create_user(username='author')
+        cache.clear()
+        counter = get_post_counter()
+        self.assertEqual(counter.count(), 0)
+        with self.captureOnCommitCallbacks(execute=True):
+            Post.objects.create(title='Пост', slug='post', content='Текст поста', author=user)
+        self.assertEqual(counter.count(), 1)
+        with self.assertRaises(RuntimeError), transaction.atomic():
+            Post.objects.create(title='Откат', slug='rollback', content='Текст поста', author=user)
+            raise RuntimeError
+        self.assertEqual(counter.count(), 1)
+
+
+@override_settings(BLOG_PERFORMANCE_HEADERS=True, BLOG_QUERY_BUDGETS_STRICT=True)
+class PerformanceMiddlewareTest(TestCase):
+    """Страницы укладываются в бюджеты запросов `BLOG_QUERY_BUDGETS`, метрики отдаются в заголовках."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='author')
+        cls.post = Post.objects.create(title='Пост', slug='post', content='Текст поста', author=cls.user)
+        parent = None
+        for i in range(10):
+            parent = Comment.objects.create(post=cls.post, author=cls.user, text=f'Ответ {i}', parent_comment=parent)
+
+    def setUp(self):
+        cache.clear()
+        stats.reset()
+
+    def test_budgets(self):
+        # По адресу на каждое представление из `BLOG_QUERY_BUDGETS`, при пустом кеше (сессия, пользователь,
+        # счётчики и страницы загружаются из БД).
+        root_comment = Comment.objects.get(post=self.post, parent_comment=None)
+        urls = [
+            reverse('blog:feed_page'),
+            reverse('blog:posts_list', args=[self.user.username]),
+            self.post.get_absolute_url(),
+            reverse('blog:search') + '?q=пост',
+            reverse('blog:comments_fragment', args=[self.post.slug]) + f'?parent={root_comment.pk}',
+        ]
+        self.assertEqual({self.client.get(url).resolver_match.view_name for url in urls},
+                         set(settings.BLOG_QUERY_BUDGETS))
+        anonymous_client = self.client_class()
+        self.client.force_login(self.user)
+        for client, authenticated in ((anonymous_client, False), (self.client, True)):
+            for url in urls:
+                with self.subTest(url=url, authenticated=authenticated):
+                    cache.clear()
+                    response = client.get(url)
+                    self.assertEqual(response.status_code, 200)
+                    self.assertIn('db;dur=', response['Server-Timing'])
+
+    async def test_async_middleware(self):
+        # Под ASGI middleware вызываются без перехода в поток, а запросы ORM из потока sync_to_async учитываются.
+        response = await self.async_client.get(reverse('blog:feed_page'))
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(iscoroutinefunction(PerformanceMiddleware(self.async_get_response)))
+        self.assertGreater(int(response['X-DB-Queries']), 0)
+
+    @staticmethod
+    async def async_get_response(request):
+        return HttpResponse()
+
+    def test_exceeded_budget(self):
+        with override_settings(BLOG_QUERY_BUDGETS={'blog:feed_page': 0}):
+            with self.assertRaises(QueryBudgetExceeded):
+                self.client.get(reverse('blog:feed_page'))
+
+    def test_stats(self):
+        self.client.get(reverse('blog:feed_page'))
+        self.client.get(reverse('blog:feed_page'))
+        summary = stats.summary()['blog:feed_page']
+        self.assertEqual(summary['requests'], 2)
+        self.assertGreater(summary['queries'], 0)
+
+
+class DatabaseSettingsTest(SimpleTestCase):
+    """Настройки соединений с БД из переменных окружения и закрытие соединений при остановке процесса."""
+
+    def run_python(self, code, **env):
+        result = subprocess.run([sys.executable, '-c', code], cwd=settings.BASE_DIR, capture_output=True, text=True,
+                                env={**os.environ, 'DB_CONN_MAX_AGE': '60', 'DB_POOL': '0', **env}, check=True)
+        return json.loads(result.stdout)
+
+    def load_database_settings(self, module='django_blog.settings', **env):
+        code = (f'import json, {module}; from django.conf import settings; '
+                f'print(json.dumps(settings.DATABASES["default"]))')
+        return self.run_python(code, **env)
+
+    def test_conn_max_age(self):
+        database = self.load_database_settings()
+        self.assertEqual(database['CONN_MAX_AGE'], 60)
+        self.assertNotIn('pool', database.get('OPTIONS', {}))
+
+    def test_asgi_disables_conn_max_age(self):
+        self.assertEqual(self.load_database_settings('django_blog.asgi')['CONN_MAX_AGE'], 0)
+
+    def test_pool(self):
+        database = self.load_database_settings(DB_ENGINE='django.db.backends.postgresql', DB_POOL='1',
+                                               DB_POOL_MAX_SIZE='4')
+        self.assertEqual(database['CONN_MAX_AGE'], 0)
+        self.assertEqual(database['OPTIONS']['pool']['max_size'], 4)
+        # Пул есть только у драйвера PostgreSQL.
+        database = self.load_database_settings(DB_ENGINE='django.db.backends.sqlite3', DB_POOL='1')
+        self.assertNotIn('OPTIONS', database)
+
+    def test_close_thread_connections(self):
+        # Постоянное соединение, открытое потоком-обработчиком, закрывается из главного потока.
+        code = (
+            'import json, threading, django_blog.wsgi\n'
+            'from django.db import connections\n'
+            'from django_blog.db import close_db_connections\n'
+            'opened = []\n'
+            'def handle_request():\n'
+            '    connections["default"].ensure_connection()\n'
+            '    opened.append(connections["default"])\n'
+            'thread = threading.Thread(target=handle_request)\n'
+            'thread.start()\n'
+            'thread.join()\n'
+            'close_db_connections()\n'
+            'print(json.dumps(opened[0].connection is None))\n'
+        )
+        with tempfile.TemporaryDirectory() as directory:
+            self.assertTrue(self.run_python(code, DB_ENGINE='django.db.backends.sqlite3',
+                                            DB_NAME=f'{directory}/db.sqlite3'))
+
+
+class BootstrapCommandTest(TestCase):
+    """Повторный `bootstrap` не загружает уже загруженную фикстуру."""
+
+    def test_fixture_loaded_once(self):
+        call_command('bootstrap', '--no-static', verbosity=0, stdout=StringIO())
+        self.assertTrue(Post.objects.exists())
+        with mock.patch('blog.management.commands.bootstrap.call_command') as bootstrap_call_command:
+            call_command('bootstrap', '--no-static', stdout=StringIO())
+        bootstrap_call_command.assert_not_called()
+        self.assertEqual(BootstrapStamp.objects.get().name, 'fixture:db_data')
+
+
+class SearchTest(TestCase):
+    """Полнотекстовый поиск по инвертированному индексу (SQLite)."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='author')
+        cls.title_match = Post.objects.create(title='Ёлка и пост', slug='elka', content='Текст', author=cls.user)
+        cls.content_match = Post.objects.create(title='Другое', slug='drugoe', content='Зелёная елка', author=cls.user)
+        Post.objects.create(title='Без совпадений', slug='other', content='Пусто', author=cls.user)
+
+    def test_ranked_results(self):
+        response = self.client.get(reverse('blog:search'), {'q': 'ёлка'})
+        self.assertEqual(list(response.context['object_list']), [self.title_match, self.content_match])
+
+    def test_all_terms_required(self):
+        response = self.client.get(reverse('blog:search'), {'q': 'елка пост'})
+        self.assertEqual(list(response.context['object_list']), [self.title_match])
+
+    def test_index_updated_on_save(self):
+        self.content_match.content = 'Сосна'
+        self.content_match.save()
+        response = self.client.get(reverse('blog:search_api'), {'q': 'сосна'})
+        self.assertEqual([result['title'] for result in response.json()['results']], ['Другое'])
+
+
+@override_settings(BLOG_PAGE_CACHE_TIMEOUT=0)
+class ConditionalGetTest(TestCase):
+    """Повторный запрос с `If-None-Match` получает 304, пока страница не изменилась (без кеша страниц)."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='author')
+        cls.post = Post.objects.create(title='Пост', slug='post', content='Текст поста', author=cls.user)
+
+    def setUp(self):
+        cache.clear()
+
+    def assertNotModified(self, url, etag):
+        response = self.client.get(url, headers={'If-None-Match': etag})
+        self.assertEqual(response.status_code, 304)
+
+    def test_post_detail(self):
+        url = self.post.get_absolute_url()
+        etag = self.client.get(url)['ETag']
+        with self.assertNumQueries(1):
+            self.assertNotModified(url, etag)
+        Comment.objects.create(post=self.post, author=self.user, text='Комментарий')
+        response = self.client.get(url, headers={'If-None-Match': etag})
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_feed_page(self):
+        url = reverse('blog:feed_page')
+        response = self.client.get(url)
+        self.assertIn('Last-Modified', response)
+        self.assertNotModified(url, response['ETag'])
+        self.post.content = 'Новый текст'
+        self.post.save()
+        self.assertEqual(self.client.get(url, headers={'If-None-Match': response['ETag']}).status_code, 200)
+
+    def test_comment_delete(self):
+        # Удаление не последнего комментария не меняет максимумы дат, но меняет счётчик комментариев в превью.
+        older = Comment.objects.create(post=self.post, author=self.user, text='Первый')
+        Comment.objects.create(post=self.post, author=self.user, text='Второй')
+        urls = [reverse('blog:feed_page'), reverse('blog:feed_page') + '?sort=discussed',
+                reverse('blog:posts_list', args=[self.user.username])]
+        etags = {url: self.client.get(url)['ETag'] for url in urls}
+        older.delete()
+        for url in urls:
+            with self.subTest(url=url):
+                response = self.client.get(url, headers={'If-None-Match': etags[url]})
+                self.assertEqual(response.status_code, 200)
+                self.assertNotEqual(response['ETag'], etags[url])
+
+    def test_etag_depends_on_user(self):
+        url = reverse('blog:posts_list', args=[self.user.username])
+        etag = self.client.get(url)['ETag']
+        self.client.force_login(self.user)
+        self.assertEqual(self.client.get(url, headers={'If-None-Match': etag}).status_code, 200)
+
+    def test_etag_depends_on_csrf_secret(self):
+        self.client.force_login(self.user)
+        url = self.post.get_absolute_url()
+        # Первый ответ ставит cookie CSRF, ETag со вторым ответом уже учитывает её секрет.
+        self.client.get(url)
+        etag = self.client.get(url)['ETag']
+        self.assertNotModified(url, etag)
+        # Повторный вход меняет секрет CSRF: страницу с формой нужно загрузить заново, а не брать из кеша браузера.
+        self.client.cookies[settings.CSRF_COOKIE_NAME] = 'a' * 32
+        self.assertEqual(self.client.get(url, headers={'If-None-Match': etag}).status_code, 200)
+
+
+class CommentStatsTest(TestCase):
+    """`Post.comment_count` и `Post.last_comment_at` следуют за комментариями."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='author')
+        cls.post = Post.objects.create(title='Пост', slug='post', content='Текст поста', author=cls.user)
+
+    def test_create_and_delete(self):
+        first = Comment.objects.create(post=self.post, author=self.user, text='Первый')
+        second = Comment.objects.create(post=self.post, author=self.user, text='Второй', parent_comment=first)
+        self.post.refresh_from_db()
+        self.assertEqual((self.post.comment_count, self.post.last_comment_at), (2, second.date_created))
+        second.delete()
+        self.post.refresh_from_db()
+        self.assertEqual((self.post.comment_count, self.post.last_comment_at), (1, first.date_created))
+
+    def test_cascade_delete(self):
+        # Ветка из корня и трёх ответов пересчитывается одним UPDATE поста, удаление поста его не обновляет.
+        root = parent = Comment.objects.create(post=self.post, author=self.user, text='Корень')
+        for i in range(3):
+            parent = Comment.objects.create(post=self.post, author=self.user, text=f'Ответ {i}', parent_comment=parent)
+        other = Comment.objects.create(post=self.post, author=self.user, text='Другая ветка')
+        for origin in (root, self.post):
+            with self.subTest(origin=origin), CaptureQueriesContext(connection) as context, \
+                    mock.patch('blog.signals.invalidate_pages') as invalidate_pages:
+                origin.delete()
+            post_updates = [query for query in context.captured_queries
+                            if query['sql'].startswith('UPDATE "blog_post"')]
+            self.assertEqual(len(post_updates), 1 if origin is root else 0)
+            # Поколение сбрасывает только корень ветки или пост (сброс после фиксации TestCase не выполняет).
+            self.assertEqual(invalidate_pages.call_count, 1)
+            if origin is root:
+                self.post.refresh_from_db()
+                self.assertEqual((self.post.comment_count, self.post.last_comment_at), (1, other.date_created))
+
+    def test_post_save_keeps_stats(self):
+        stale_post = Post.objects.get(pk=self.post.pk)
+        Comment.objects.create(post=self.post, author=self.user, text='Комментарий')
+        stale_post.title = 'Новый заголовок'
+        stale_post.save()
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.comment_count, 1)
+
+    def test_recount_comments(self):
+        Comment.objects.create(post=self.post, author=self.user, text='Комментарий')
+        Post.objects.update(comment_count=5, last_comment_at=None)
+        call_command('recount_comments', stdout=StringIO())
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.comment_count, 1)
+        self.assertIsNotNone(self.post.last_comment_at)
+
+    @mock.patch.object(Comment, 'MAX_DEPTH', 2)
+    def test_max_depth(self):
+        parent = None
+        for i in range(3):
+            parent = Comment.objects.create(post=self.post, author=self.user, text=f'Ответ {i}',
+                                            parent_comment=parent)
+        with self.assertRaises(ValueError):
+            Comment.objects.create(post=self.post, author=self.user, text='Глубже', parent_comment=parent)
+        self.client.force_login(self.user)
+        response = self.client.post(self.post.get_absolute_url(), {'text': 'Глубже', 'parent_comment': parent.pk})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(Comment.objects.count(), 3)
+        with self.assertRaises(ValueError):
+            Comment.make_path('', 10 ** Comment.PATH_STEP)
+
+
+class RenderCommentsTagTest(TestCase):
+    """Тег `render_comments` вкладывает ответы в `comment-child` и экранирует текст комментариев."""
+
+    def test_nested_replies(self):
+        user = User.objects.create_user(username='author')
+        post = Post.objects.create(title='Пост', slug='post', content='Текст поста', author=user)
+        parent = None
+        for i in range(3):
+            parent = Comment.objects.create(post=post, author=user, text=f'Ответ {i}', parent_comment=parent)
+        Comment.objects.create(post=post, author=user, text='Второй корень <script>')
+        html = self.client.get(post.get_absolute_url()).content.decode()
+        self.assertEqual(html.count('<div class="comment-child">'), 2)
+        self.assertIn('Второй корень &lt;script&gt;', html)
+        self.assertLess(html.index('Второй корень'), html.index('Ответ 0'))
+        self.assertLess(html.index('Ответ 1'), html.index('Ответ 2'))
+
+
+@override_settings(BLOG_COMMENTS_PER_PAGE=3, BLOG_COMMENTS_MAX_DEPTH=2)
+class CommentChunksTest(TestCase):
+    """Страница поста показывает ограниченную порцию комментариев, остальное подгружается фрагментами."""
+
+    def setUp(self):
+        user = User.objects.create_user(username='author')
+        self.post = Post.objects.create(title='Пост', slug='post', content='Текст поста', author=user)
+        for i in range(4):
+            Comment.objects.create(post=self.post, author=user, text=f'Корень {i}')
+        parent = None
+        for i in range(3):
+            parent = Comment.objects.create(post=self.post, author=user, text=f'Ветка {i}', parent_comment=parent)
+        self.hidden_parent = Comment.objects.get(text='Ветка 1')
+        self.fragment_url = reverse('blog:comments_fragment', args=[self.post.slug])
+
+    def test_first_chunk_is_bounded(self):
+        html = self.client.get(self.post.get_absolute_url()).content.decode()
+        self.assertEqual(html.count('class="single-comment"'), 3)
+        self.assertIn('Показать ещё комментарии', html)
+
+    def test_next_chunk(self):
+        response = self.client.get(self.post.get_absolute_url())
+        cursor = response.context['comments_chunk'].next_cursor
+        html = self.client.get(self.fragment_url, {'after': cursor}).content.decode()
+        self.assertEqual(html.count('class="single-comment"'), 3)
+        self.assertNotIn('Показать ещё комментарии', html)
+
+    def test_hidden_replies(self):
+        html = self.client.get(self.fragment_url).content.decode()
+        self.assertIn(f'parent={self.hidden_parent.pk}', html)
+        self.assertNotIn('Ветка 2', html)
+        html = self.client.get(self.fragment_url, {'parent': self.hidden_parent.pk}).content.decode()
+        self.assertIn('Ветка 2', html)
+        self.assertNotIn('Ветка 1', html)
+
+    def test_invalid_cursor(self):
+        self.assertEqual(self.client.get(self.fragment_url, {'after': 'bad'}).status_code, 404)
+        self.assertEqual(self.client.get(self.fragment_url, {'parent': 'x'}).status_code, 404)
+
+
+@override_settings(BLOG_FEED_CHUNK_SIZE=2)
+class PostFeedTest(TestCase):
+    """Ленты Atom/RSS отдаются потоком, кешируются до изменения постов и поддерживают условные запросы."""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='author')
+        other = User.objects.create_user(username='other')
+        for i in range(3):
+            Post.objects.create(title=f'Пост {i}', slug=f'post-{i}', content='Текст', author=self.user)
+        Post.objects.create(title='Чужой пост', slug='other-post', content='Текст', author=other)
+
+    def get_feed(self, url, **extra):
+        response = self.client.get(url, **extra)
+        self.assertTrue(response.streaming)
+        return response, b''.join(response.streaming_content).decode()
+
+    def test_atom_and_rss(self):
+        response, content = self.get_feed(reverse('blog:posts_feed', args=['atom']))
+        self.assertEqual(response['Content-Type'], 'application/atom+xml; charset=utf-8')
+        self.assertEqual(content.count('<entry>'), 4)
+        self.assertTrue(content.endswith('</feed>'))
+        response, content = self.get_feed(reverse('blog:user_posts_feed', args=['author', 'rss']))
+        self.assertEqual(content.count('<item>'), 3)
+        self.assertNotIn('Чужой пост', content)
+        self.assertEqual(self.client.get(reverse('blog:posts_feed', args=['json'])).status_code, 404)
+
+    @override_settings(BLOG_FEED_ITEMS=2, BLOG_FEED_CHUNK_SIZE=1)
+    def test_latest_items(self):
+        content = self.get_feed(reverse('blog:posts_feed', args=['rss']))[1]
+        self.assertEqual(content.count('<item>'), 2)
+        self.assertIn('Чужой пост', content)
+        self.assertNotIn('Пост 0', content)
+        self.assertTrue(content.endswith('</rss>'))
+
+    def test_cache_and_conditional_get(self):
+        url = reverse('blog:posts_feed', args=['atom'])
+        response, content = self.get_feed(url)
+        with self.assertNumQueries(1):
+            self.assertEqual(self.get_feed(url)[1], content)
+        with self.assertNumQueries(1):
+            self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag']).status_code, 304)
+        Post.objects.create(title='Новый пост', slug='new-post', content='Текст', author=self.user)
+        self.assertIn('Новый пост', self.get_feed(url)[1])
+
+
+@override_settings(BLOG_SITEMAP_SHARD_SIZE=2)
+class SitemapTest(TestCase):
+    """Карта сайта разбита на шарды по pk, XML шарда кешируется до изменения его объектов."""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='author')
+        self.posts = [Post.objects.create(title=f'Пост {i}', slug=f'post-{i}', content='Текст', author=self.user)
+                      for i in range(3)]
+        User.objects.create_user(username='reader')
+
+    def get_shard(self, section, shard):
+        response = self.client.get(reverse('blog:sitemap_section', args=[section, shard]))
+        return b''.join(response.streaming_content).decode()
+
+    def test_index(self):
+        first_shard = (self.posts[0].pk - 1) // 2
+        content = self.client.get(reverse('blog:sitemap')).content.decode()
+        self.assertEqual(content.count('<sitemap>'), 3)
+        self.assertIn(reverse('blog:sitemap_section', args=['posts', first_shard]), content)
+        authors = self.get_shard('authors', (self.user.pk - 1) // 2)
+        self.assertIn(reverse('blog:posts_list', args=['author']), authors)
+        self.assertNotIn('reader', authors)
+
+    def test_shard_cache(self):
+        post = self.posts[-1]
+        shard = (post.pk - 1) // 2
+        content = self.get_shard('posts', shard)
+        self.assertIn(post.get_absolute_url(), content)
+        with self.assertNumQueries(1):
+            self.assertEqual(self.get_shard('posts', shard), content)
+        post.title = 'Изменённый пост'
+        post.save()
+        with self.assertNumQueries(2):
+            self.get_shard('posts', shard)
+        self.assertEqual(self.client.get(reverse('blog:sitemap_section', args=['posts', 100])).status_code, 404)
+
+
+def reload_urlconf():
+    """Заново импортирует URLconf, который выбирает представления по `settings.BLOG_ASYNC_VIEWS` при импорте."""
+    importlib.reload(importlib.import_module('blog.urls'))
+    importlib.reload(importlib.import_module(settings.ROOT_URLCONF))
+    clear_url_caches()
+
+
+@override_settings(BLOG_ASYNC_VIEWS=True, BLOG_PAGE_CACHE_TIMEOUT=0, BLOG_PERFORMANCE_HEADERS=True,
+                   BLOG_QUERY_BUDGETS_STRICT=True)
+class AsyncViewsTest(TestCase):
+    """Асинхронные представления URLconf с `BLOG_ASYNC_VIEWS` укладываются в бюджеты запросов и отдают 304."""
+
+    @classmethod
+    def setUpClass(cls):
+        # Очистка регистрируется до переопределения настроек и выполняется после их восстановления.
+        cls.addClassCleanup(reload_urlconf)
+        super().setUpClass()
+        reload_urlconf()
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='author')
+        cls.post = Post.objects.create(title='Пост', slug='post', content='Текст поста', author=cls.user)
+        parent = None
+        for i in range(3):
+            parent = Comment.objects.create(post=cls.post, author=cls.user, text=f'Ответ {i}', parent_comment=parent)
+
+    def setUp(self):
+        cache.clear()
+
+    async def assertView(self, url, view_class, text):
+        response = await self.async_client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertIs(response.resolver_match.func.view_class, view_class)
+        self.assertContains(response, text)
+        self.assertLessEqual(int(response['X-DB-Queries']),
+                             settings.BLOG_QUERY_BUDGETS[response.resolver_match.view_name])
+        not_modified = await self.async_client.get(url, headers={'If-None-Match': response['ETag']})
+        self.assertEqual(not_modified.status_code, 304)
+        return response
+
+    async def test_views(self):
+        urls = [
+            (reverse('blog:feed_page'), AsyncFeedView, 'Пост'),
+            (reverse('blog:posts_list', args=[self.user.username]), AsyncPostsView, 'Пост'),
+            (self.post.get_absolute_url(), AsyncPostDetailView, 'Ответ 2'),
+            (reverse('blog:search') + '?q=пост', SearchView, 'Пост'),
+        ]
+        for authenticated in (False, True):
+            if authenticated:
+                await self.async_client.aforce_login(self.user)
+                # Первый ответ ставит cookie CSRF, секрет которой входит в ETag авторизованных страниц.
+                await self.async_client.get(reverse('blog:feed_page'))
+            for url, view_class, text in urls:
+                with self.subTest(url=url, authenticated=authenticated):
+                    await cache.aclear()
+                    await self.assertView(url, view_class, text)
+
+    async def test_add_comment(self):
+        await self.async_client.aforce_login(self.user)
+        response = await self.async_client.post(self.post.get_absolute_url(), {'text': 'Новый комментарий'})
+        self.assertEqual(response.status_code, 302)
+        self.assertTrue(await Comment.objects.filter(post=self.post, text='Новый комментарий').aexists())
+
+
+@override_settings(DB_REPLICAS=['replica1'])
+class ReplicaRoutingTest(TransactionTestCase):
+    """
+    GET-запросы к страницам постов читают с реплики, после изменяющего запроса клиент закреплён за primary.
+
+    `replica1` в тестах - зеркало `default` со своим соединением (см. `DATABASES` в настройках), поэтому видно, какое
+    соединение выполнило чтение. `TransactionTestCase`: зеркало не видит данных незафиксированной транзакции `TestCase`.
+    """
+    databases = {'default', 'replica1'}
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='author', password='password')
+        self.post = Post.objects.create(title='Пост', slug='post', content='Текст', author=self.user)
+
+    @staticmethod
+    def read_tables(captured):
+        return {table for query in captured.captured_queries if query['sql'].startswith('SELECT')
+                for table in ('blog_post', 'blog_comment') if f'"{table}"' in query['sql']}
+
+    @contextmanager
+    def capture_reads(self):
+        """Возвращает таблицы блога, прочитанные через соединения `default` и `replica1`."""
+        reads = {}
+        with CaptureQueriesContext(connections['default']) as primary, \
+                CaptureQueriesContext(connections['replica1']) as replica:
+            yield reads
+        reads.update(default=self.read_tables(primary), replica1=self.read_tables(replica),
+                     replica1_queries=len(replica))
+
+    def test_get_reads_from_replica(self):
+        with self.capture_reads() as reads:
+            response = self.client.get(self.post.get_absolute_url())
+        self.assertContains(response, 'Текст')
+        self.assertIn('blog_post', reads['replica1'])
+        self.assertEqual(reads['default'], set())
+        with self.capture_reads() as reads:
+            self.client.get(reverse('blog:login'))
+        self.assertEqual(reads['replica1_queries'], 0)
+
+    def test_async_get_reads_from_replica(self):
+        # Запросы ORM асинхронного запроса выполняются в этом потоке (`sync_to_async`) и его соединениями.
+        with self.capture_reads() as reads:
+            response = async_to_sync(self.async_client.get)(self.post.get_absolute_url())
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('blog_post', reads['replica1'])
+        self.assertEqual(reads['default'], set())
+
+    def test_write_pins_to_primary(self):
+        self.client.force_login(self.user)
+        with self.capture_reads() as reads:
+            response = self.client.post(self.post.get_absolute_url(), {'text': 'Комментарий'})
+        self.assertEqual(reads['replica1_queries'], 0)
+        self.assertIn(ReplicaPinningMiddleware.cookie_name, response.cookies)
+        with self.capture_reads() as reads:
+            response = self.client.get(self.post.get_absolute_url())
+        self.assertContains(response, 'Комментарий')
+        self.assertEqual(reads['replica1_queries'], 0)
+        self.assertIn('blog_post', reads['default'])
+
+
+class CachedAuthTest(TestCase):
+    """Сессия и пользователь авторизованного запроса берутся из кеша, изменение пользователя сбрасывает кеш."""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='author', password='password')
+        Post.objects.create(title='Пост', slug='post', content='Текст', author=self.user)
+        self.client.force_login(self.user)
+
+    def test_feed_without_auth_queries(self):
+        self.client.get(reverse('blog:feed_page'))
+        # Только валидаторы ETag и выборка постов: количество постов уже в кеше счётчика, сессия и пользователь -
+        # в кеше сессий и `CachedModelBackend`.
+        with self.assertNumQueries(2):
+            response = self.client.get(reverse('blog:feed_page'))
+        self.assertContains(response, 'author')
+
+    def test_password_hash_not_cached(self):
+        self.client.get(reverse('blog:feed_page'))
+        cached = cache.get(CachedModelBackend.make_key(self.user.pk))
+        self.assertNotIn(self.user.password, repr(cached))
+        with self.assertNumQueries(0):
+            user = CachedModelBackend().get_user(self.user.pk)
+            self.assertEqual(user.get_session_auth_hash(), self.user.get_session_auth_hash())
+        self.assertIn('password', user.get_deferred_fields())
+
+    def test_cached_user_fields(self):
+        self.user.refresh_from_db()
+        admin = User.objects.create_superuser(username='admin', password='password')
+        for user, is_superuser in ((self.user, False), (admin, True)):
+            with self.subTest(username=user.username):
+                CachedModelBackend().get_user(user.pk)
+                with self.assertNumQueries(0):
+                    cached_user = CachedModelBackend().get_user(user.pk)
+                    self.assertEqual((cached_user.pk, cached_user.username, cached_user.is_active,
+                                      cached_user.is_staff, cached_user.is_superuser, cached_user.last_login),
+                                     (user.pk, user.username, True, is_superuser, is_superuser, user.last_login))
+                self.assertEqual(cached_user.has_perm('blog.delete_post'), is_superuser)
+
+    def test_password_change_view(self):
+        self.client.get(reverse('blog:feed_page'))
+        response = self.client.post(reverse('blog:password_change'), {
+            'old_password': 'password', 'new_password1': 'Nw-pass-8472', 'new_password2': 'Nw-pass-8472',
+        })
+        self.assertRedirects(response, reverse('blog:password_change_done'))
+        response = self.client.get(reverse('blog:feed_page'))
+        self.assertEqual(response.wsgi_request.user.username, 'author')
+        self.assertContains(response, 'author')
+        self.user.refresh_from_db()
+        self.assertTrue(self.user.check_password('Nw-pass-8472'))
+
+    def test_password_change_invalidates_cache(self):
+        self.client.get(reverse('blog:feed_page'))
+        self.user.set_password('new-password')
+        self.user.save()
+        response = self.client.get(reverse('blog:feed_page'))
+        self.assertFalse(response.wsgi_request.user.is_authenticated)
+
+
+class PageCacheTest(TestCase):
+    """Анонимные страницы отдаются из кеша без запросов к БД и сбрасываются при изменении постов и комментариев."""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='author')
+        self.post = Post.objects.create(title='Пост', slug='post', content='Текст поста', author=self.user)
+
+    def test_anonymous_pages(self):
+        for url in (reverse('blog:feed_page'), reverse('blog:posts_list', args=['author']),
+                    self.post.get_absolute_url()):
+            with self.subTest(url=url):
+                content = self.client.get(url).content
+                with self.assertNumQueries(0):
+                    response = self.client.get(url)
+                self.assertEqual(response.content, content)
+                self.assertEqual(response['X-Accel-Expires'], str(settings.BLOG_PAGE_CACHE_PROXY_TIMEOUT))
+                with self.assertNumQueries(0):
+                    self.assertEqual(self.client.get(url, headers={'If-None-Match': response['ETag']}).status_code,
+                                     304)
+
+    def test_invalidation(self):
+        url = self.post.get_absolute_url()
+        self.client.get(url)
+        Comment.objects.create(post=self.post, author=self.user, text='Новый комментарий')
+        self.assertContains(self.client.get(url), 'Новый комментарий')
+        self.client.get(reverse('blog:feed_page'), {'page': 1})
+        self.post.title = 'Новый заголовок'
+        self.post.save()
+        self.assertContains(self.client.get(reverse('blog:feed_page'), {'page': 1}), 'Новый заголовок')
+
+    def test_authenticated_not_cached(self):
+        url = reverse('blog:feed_page')
+        self.client.get(url)
+        self.client.force_login(self.user)
+        response = self.client.get(url)
+        self.assertContains(response, 'Выйти')
+        self.assertNotIn('X-Accel-Expires', response)
+
+    @override_settings(BLOG_HEADER_SSI=True)
+    def test_header_ssi(self):
+        url = reverse('blog:feed_page')
+        self.client.force_login(self.user)
+        self.assertContains(self.client.get(url), f'<!--# include virtual="{reverse("blog:header_fragment")}" -->')
+        with self.assertNumQueries(0):
+            self.client.get(url)
+        self.assertContains(self.client.get(reverse('blog:header_fragment')), 'Выйти')
+
+
+class ImportExportPostsTest(TestCase):
+    """`export_posts` и `import_posts` переносят посты и деревья комментариев с датами, путями и счётчиками."""
+
+    def setUp(self):
+        cache.clear()
+        user = User.objects.create_user(username='author', password='password')
+        post = Post.objects.create(title='Пост', slug='post', content='Текст поста', author=user)
+        parent = None
+        for i in range(3):
+            parent = Comment.objects.create(post=post, author=user, text=f'Ответ {i}', parent_comment=parent)
+        Comment.objects.create(post=post, author=user, text='Корень')
+        Post.objects.create(title='Без комментариев', slug='empty', content='Текст', author=user)
+
+    def snapshot(self):
+        return (list(Post.objects.order_by('slug').values_list('slug', 'excerpt', 'date_created', 'last_modified',
+                                                               'comment_count', 'last_comment_at')),
+                [(text, depth, parent, date_created) for text, depth, parent, date_created in
+                 Comment.objects.order_by('path').values_list('text', 'depth', 'parent_comment__text',
+                                                              'date_created')])
+
+    def test_round_trip(self):
+        before = self.snapshot()
+        with tempfile.TemporaryDirectory() as directory:
+            path = f'{directory}/archive.ndjson'
+            call_command('export_posts', path, stderr=StringIO())
+            User.objects.all().delete()
+            call_command('import_posts', path, batch_size=2, stdout=StringIO())
+            self.assertEqual(self.snapshot(), before)
+            self.assertTrue(User.objects.get(username='author').check_password('password'))
+            self.assertEqual(Post.objects.filter(terms__term='текст').count(), 2)
+
+            output = StringIO()
+            call_command('import_posts', path, stdout=output)
+            self.assertIn('comment: создано 0, пропущено 4', output.getvalue())
+            self.assertEqual(self.snapshot(), before)
+
+    def test_resume(self):
+        before = self.snapshot()
+        with tempfile.TemporaryDirectory() as directory:
+            path = f'{directory}/archive.ndjson'
+            call_command('export_posts', path, stderr=StringIO())
+            with open(path, encoding='utf-8') as archive:
+                lines = archive.readlines()
+            User.objects.all().delete()
+            # Импорт прерван после двух комментариев первого поста.
+            interrupted = f'{directory}/interrupted.ndjson'
+            last_line = [i for i, line in enumerate(lines) if '"comment"' in line][1]
+            with open(interrupted, 'w', encoding='utf-8') as archive:
+                archive.writelines(lines[:last_line + 1])
+            call_command('import_posts', interrupted, batch_size=1, stdout=StringIO())
+            self.assertEqual(Comment.objects.count(), 2)
+
+            output = StringIO()
+            call_command('import_posts', path, batch_size=1, stdout=output)
+            self.assertIn('comment: создано 2, пропущено 2', output.getvalue())
+            self.assertEqual(self.snapshot(), before)
+
+    def test_existing_post_comments_skipped(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = f'{directory}/archive.ndjson'
+            call_command('export_posts', path, stderr=StringIO())
+            Comment.objects.all().delete()
+            # Пост сайта с тем же slug, что у поста из архива, комментарии архива к нему не относятся.
+            output = StringIO()
+            call_command('import_posts', path, stdout=output)
+        self.assertIn('comment: создано 0, пропущено 4', output.getvalue())
+        self.assertFalse(Comment.objects.exists())
@@ -1,3 +1,4 @@
+from django.conf import settings
 from django.contrib.auth import views as auth_views
 from django.urls import path, include, reverse_lazy
 from django.views.generic import RedirectView
@@ -7,11 +8,17 @@ from .forms import CustomAuthenticationForm
 
 app_name = 'blog'
 
+if settings.BLOG_ASYNC_VIEWS:
+    FeedView, PostsView, PostDetailView = views.AsyncFeedView, views.AsyncPostsView, views.AsyncPostDetailView
+else:
+    FeedView, PostsView, PostDetailView = views.FeedView, views.PostsView, views.PostDetailView
+
 posts_patterns = [
     path('add/', views.AddPostView.as_view(), name='add_post'),
     path('delete/<slug:slug>/', views.DeletePostView.as_view(), name='delete_post'),
     path('update/<slug:slug>/', views.UpdatePostView.as_view(), name='update_post'),
-    path('<slug:slug>/', views.PostDetailView.as_view(), name='post_detail'),
+    path('<slug:slug>/', PostDetailView.as_view(), name='post_detail'),
+    path('<slug:slug>/comments/', views.comments_fragment_view, name='comments_fragment'),
 ]
 
 account_patterns = [
@@ -46,8 +53,16 @@ account_patterns = [
 urlpatterns = [
     path('', RedirectView.as_view(url=reverse_lazy('blog:feed_page'))),
     path('profile/settings/', views.ProfileSettingsView.as_view(), name='profile_settings'),
-    path('profile/<username>/', views.PostsView.as_view(), name='posts_list'),
+    path('profile/<username>/', PostsView.as_view(), name='posts_list'),
+    path('profile/<username>/<str:feed_type>/', views.posts_feed_view, name='user_posts_feed'),
     path('posts/', include(posts_patterns)),
     path('accounts/', include(account_patterns)),
-    path('feed/', views.FeedView.as_view(), name='feed_page'),
+    path('feed/', FeedView.as_view(), name='feed_page'),
+    path('feed/<str:feed_type>/', views.posts_feed_view, name='posts_feed'),
+    path('search/', views.SearchView.as_view(), name='search'),
+    path('api/search/', views.search_api_view, name='search_api'),
+    path('fragments/header/', views.header_fragment_view, name='header_fragment'),
+    path('sitemap.xml', views.sitemap_index_view, name='sitemap'),
+    path('sitemap-<slug:section>-<int:shard>.xml', views.sitemap_section_view, name='sitemap_section'),
+    path('performance/', views.performance_stats_view, name='performance_stats'),
 ]
@@ -1,23 +1,150 @@
+import hashlib
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.admin.views.decorators import staff_member_required
 from django.contrib.auth import login, get_user_model
 from django.contrib.auth.mixins import LoginRequiredMixin
 from django.contrib.auth.decorators import login_required
+from django.contrib.auth.views import PasswordChangeView, redirect_to_login
 from django.contrib.auth.models import User
-from django.contrib.auth.views import PasswordChangeView
-from django.http import HttpResponseForbidden
-from django.shortcuts import render, redirect, get_object_or_404
+from django.core.cache import cache
+from django.core.paginator import InvalidPage
+from django.db.models import Count, Max, Sum
+from django.http import Http404, HttpResponse, HttpResponseForbidden, JsonResponse, StreamingHttpResponse
+from django.shortcuts import aget_object_or_404, render, redirect, get_object_or_404
 from django.template.defaultfilters import slugify
 from django.urls import reverse_lazy, reverse
 from django.utils.decorators import method_decorator
+from django.utils.http import urlencode
+from django.views.decorators.cache import never_cache
+from django.views.decorators.http import condition
 from django.views.generic.detail import DetailView
 from django.views.generic.edit import CreateView, UpdateView, DeleteView
 from django.views.generic.list import ListView
 from transliterate import translit
 
+from .counters import get_post_counter
+from .feeds import PostFeed
 from .forms import AddPostForm, UserCreateForm, CustomPasswordChangeForm, ProfileSettingsForm, AddCommentForm
-from .models import Post, Comment
+from .middleware import stats
+from .models import Post
+from .page_cache import is_anonymous_request, make_page_key, make_page_response, store_page
+from .pagination import CommentThreadPaginator, CountedPaginator, CursorPage, CursorPaginator
+from .search import get_search_backend
+from .sitemaps import SECTIONS, render_sitemap_index
+
+
+class ConditionalGetMixin:
+    """
+    Условные GET-запросы (ETag / Last-Modified) для страниц с постами.
 
+    До обработки GET- и HEAD-запроса представление одним запросом к БД получает валидаторы страницы
+    (`get_validators`). Если они совпадают с `If-None-Match` / `If-Modified-Since` запроса, возвращается
+    `304 Not Modified` без загрузки объектов и рендеринга шаблона.
 
-class FeedView(ListView):
+    ETag также зависит от текущего пользователя (шапка и формы страницы у каждого свои), для авторизованного
+    пользователя - от секрета CSRF из cookie (формы страницы содержат токен, а вход в систему меняет секрет, и
+    закешированная браузером страница отправила бы форму с устаревшим токеном), и от `settings.BLOG_ETAG_VERSION`,
+    которую нужно менять при выкладке изменённых шаблонов.
+    """
+
+    def get_validators(self):
+        """
+        Возвращает валидаторы страницы.
+
+        Returns:
+            tuple | None: Дата последнего изменения страницы и список значений, от которых зависит ETag,
+             или None, если валидаторы не вычисляются (например, объекта нет).
+        """
+        return None
+
+    async def aget_validators(self):
+        """Асинхронная версия `get_validators`."""
+        return await sync_to_async(self.get_validators)()
+
+    def make_etag(self, parts):
+        # Секрет CSRF, прочитанный `CsrfViewMiddleware` из cookie. Анонимные страницы форм не содержат.
+        csrf_secret = self.request.META.get('CSRF_COOKIE') if self.request.user.is_authenticated else None
+        parts = [settings.BLOG_ETAG_VERSION, self.request.user.pk, csrf_secret, *parts]
+        return 'W/"%s"' % hashlib.md5(repr(parts).encode(), usedforsecurity=False).hexdigest()
+
+    def conditional(self, validators, view):
+        last_modified, etag = None, None
+        if validators is not None:
+            last_modified, etag = validators[0], self.make_etag(validators[1])
+        return condition(etag_func=lambda request, *args, **kwargs: etag,
+                         last_modified_func=lambda request, *args, **kwargs: last_modified)(view)
+
+    def dispatch(self, request, *args, **kwargs):
+        if request.method not in ('GET', 'HEAD'):
+            return super().dispatch(request, *args, **kwargs)
+        if self.view_is_async:
+            return self.aconditional_dispatch(request, *args, **kwargs)
+        return self.conditional(self.get_validators(), super().dispatch)(request, *args, **kwargs)
+
+    async def aconditional_dispatch(self, request, *args, **kwargs):
+        request.user = await request.auser()
+        dispatch = super().dispatch
+
+        async def view(request, *args, **kwargs):
+            return await dispatch(request, *args, **kwargs)
+
+        return await self.conditional(await self.aget_validators(), view)(request, *args, **kwargs)
+
+
+class PageCacheMixin:
+    """
+    Кеш страниц целиком для анонимных GET-запросов.
+
+    Запрос без cookie сессии (`is_anonymous_request`) получает страницу из кеша без обращений к БД,
+    в том числе `304 Not Modified` по сохранённым `ETag` / `Last-Modified`. Ключ страницы включает адрес,
+    параметры запроса и поколение кеша, которое увеличивают сигналы `Post` и `Comment` (`invalidate_pages`).
+    Ответ анонимному пользователю также получает заголовок `X-Accel-Expires`, по которому nginx кеширует его
+    в `proxy_cache` на `settings.BLOG_PAGE_CACHE_PROXY_TIMEOUT` секунд.
+
+    Attributes:
+        - page_cache (bool): Кешировать страницы представления.
+        - page_cache_shared (bool): Страница отличается для пользователей только шапкой, поэтому при
+         `settings.BLOG_HEADER_SSI` (шапка подставляется nginx через SSI, см. `header_fragment_view`)
+         закешированная страница отдаётся и авторизованным пользователям.
+    """
+    page_cache = True
+    page_cache_shared = False
+
+    def get_page_cache_key(self, request):
+        if (not self.page_cache or not settings.BLOG_PAGE_CACHE_TIMEOUT or request.method not in ('GET', 'HEAD')
+                or not (is_anonymous_request(request)
+                        or self.page_cache_shared and settings.BLOG_HEADER_SSI)):
+            return None
+        return make_page_key(request)
+
+    def finalize_page_response(self, request, key, response):
+        if is_anonymous_request(request) and response.status_code == 200:
+            response['X-Accel-Expires'] = settings.BLOG_PAGE_CACHE_PROXY_TIMEOUT
+        if hasattr(response, 'add_post_render_callback'):
+            response.add_post_render_callback(lambda response: store_page(key, response))
+        return response
+
+    def dispatch(self, request, *args, **kwargs):
+        key = self.get_page_cache_key(request)
+        if key is None:
+            return super().dispatch(request, *args, **kwargs)
+        if self.view_is_async:
+            return self.apage_cache_dispatch(key, request, *args, **kwargs)
+        cached = cache.get(key)
+        if cached is not None:
+            return self.finalize_page_response(request, key, make_page_response(request, cached))
+        return self.finalize_page_response(request, key, super().dispatch(request, *args, **kwargs))
+
+    async def apage_cache_dispatch(self, key, request, *args, **kwargs):
+        cached = await cache.aget(key)
+        if cached is not None:
+            return self.finalize_page_response(request, key, make_page_response(request, cached))
+        return self.finalize_page_response(request, key, await super().dispatch(request, *args, **kwargs))
+
+
+class FeedView(PageCacheMixin, ConditionalGetMixin, ListView):
     """
     Представление для списка постов на общей странице постов.
 
@@ -32,20 +159,92 @@ class FeedView(ListView):
     Attributes:
         - paginate_by (int): Кол-во записей на одну страницу.
         - template_name (str): Имя шаблона, используемого для отобрежния списка постов.
+        - preview_fields (list): Поля поста (и автора), загружаемые для превью. Автор загружается тем же запросом.
+        - pagination_mode (str): Режим пагинации: 'pages' - нумерованные страницы, 'cursor' - курсорная
+         пагинация (`CursorPaginator`) без подсчёта записей. По умолчанию берётся из `settings.BLOG_PAGINATION_MODE`.
+         В режиме 'pages' количество постов берётся из счётчика `settings.BLOG_POST_COUNTER`.
+        - sort_orderings (dict): Варианты сортировки (параметр `sort`): 'new' - новые посты первыми, 'discussed' -
+         посты с комментариями, недавно обсуждавшиеся первыми (по `Post.last_comment_at`, без JOIN с комментариями).
+         В режиме 'cursor' посты всегда сортируются по дате создания.
+        - replica_reads (bool): GET-запросы читают посты с реплик БД (см. `ReplicaPinningMiddleware`).
+        - page_cache_shared (bool): См. `PageCacheMixin`.
 
     Context:
         - paginator_range (list): Список отображаемых страниц для выбора в зависимости от страницы.
+        - cursor_pagination (bool): Используется ли курсорная пагинация.
+        - sort (str): Текущая сортировка.
+        - pagination_params (str): Параметры запроса, добавляемые к ссылкам пагинации.
     """
     paginate_by = 5
     template_name = 'blog/feed_page.html'
+    pagination_mode = None
+    preview_fields = ['title', 'slug', 'excerpt', 'date_created', 'comment_count', 'author__username']
+    sort_orderings = {'new': None, 'discussed': '-last_comment_at'}
+    replica_reads = True
+    page_cache_shared = True
+
+    def get_sort(self):
+        sort = self.request.GET.get('sort')
+        if sort not in self.sort_orderings or self.get_pagination_mode() == 'cursor':
+            return 'new'
+        return sort
 
     def get_queryset(self):
-        return Post.objects.all()
+        queryset = Post.objects.select_related('author').only(*self.preview_fields)
+        ordering = self.sort_orderings[self.get_sort()]
+        if ordering == '-last_comment_at':
+            queryset = queryset.filter(last_comment_at__isnull=False).order_by(ordering)
+        return queryset
+
+    def get_validators_aggregates(self):
+        # Сумма счётчиков комментариев меняется при удалении любого комментария, в том числе не последнего, когда
+        # максимумы дат остаются прежними.
+        return {'latest': Max('last_modified'), 'last_comment': Max('last_comment_at'),
+                'comments': Sum('comment_count')}
+
+    def get_validators(self):
+        # Количество постов нужно, так как удаление поста не меняет максимум `last_modified`.
+        aggregates = Post.objects.aggregate(**self.get_validators_aggregates())
+        return self.make_validators(aggregates, get_post_counter().count())
+
+    @staticmethod
+    def make_validators(aggregates, count):
+        # Без постов (в том числе для несуществующего пользователя) страница не кешируется.
+        if aggregates['latest'] is None:
+            return None
+        last_modified = max(filter(None, [aggregates['latest'], aggregates['last_comment']]))
+        return last_modified, [aggregates['latest'], aggregates['last_comment'], aggregates['comments'], count]
+
+    def get_pagination_mode(self):
+        return self.pagination_mode or settings.BLOG_PAGINATION_MODE
+
+    def get_post_count(self):
+        return get_post_counter().count()
+
+    def get_paginator(self, queryset, per_page, orphans=0, allow_empty_first_page=True, **kwargs):
+        # Счётчик знает только общее количество постов, отфильтрованные сортировкой посты считаются запросом.
+        count = self.get_post_count() if self.get_sort() == 'new' else None
+        return CountedPaginator(queryset, per_page, count=count, orphans=orphans,
+                                allow_empty_first_page=allow_empty_first_page, **kwargs)
+
+    def paginate_queryset(self, queryset, page_size):
+        if self.get_pagination_mode() != 'cursor':
+            return super().paginate_queryset(queryset, page_size)
+        paginator = CursorPaginator(queryset, page_size)
+        try:
+            page = paginator.page(after=self.request.GET.get('after'), before=self.request.GET.get('before'))
+        except InvalidPage as e:
+            raise Http404(str(e))
+        return paginator, page, page.object_list, page.has_other_pages()
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         page = context['page_obj']
-        context['paginator_range'] = page.paginator.get_elided_page_range(page.number, on_ends=1)
+        context['cursor_pagination'] = isinstance(page, CursorPage)
+        context['sort'] = self.get_sort()
+        context['pagination_params'] = urlencode({'sort': context['sort']}) if context['sort'] != 'new' else ''
+        if not context['cursor_pagination']:
+            context['paginator_range'] = page.paginator.get_elided_page_range(page.number, on_ends=1)
         return context
 
 
@@ -64,15 +263,28 @@ class PostsView(FeedView):
 
     Attributes:
         - template_name (str): Имя шаблона, используемого для отобрежния списка постов.
+        - page_cache_shared (bool): Шапка страницы своего профиля отличается от чужого, поэтому страница
+         кешируется только для анонимных пользователей.
     """
     template_name = 'blog/user_posts.html'
+    page_cache_shared = False
 
     def get_queryset(self):
         self.user_obj = get_object_or_404(User, username=self.kwargs['username'])
-        return Post.objects.filter(author=self.user_obj)
+        return super().get_queryset().filter(author=self.user_obj)
+
+    def get_post_count(self):
+        return get_post_counter().count(author=self.user_obj)
 
+    def get_validators_queryset(self):
+        return Post.objects.filter(author__username=self.kwargs['username'])
 
-class PostDetailView(DetailView):
+    def get_validators(self):
+        aggregates = self.get_validators_queryset().aggregate(count=Count('pk'), **self.get_validators_aggregates())
+        return self.make_validators(aggregates, aggregates['count'])
+
+
+class PostDetailView(PageCacheMixin, ConditionalGetMixin, DetailView):
     """
     Представление для отображения поста.
 
@@ -90,18 +302,48 @@ class PostDetailView(DetailView):
     Attributes:
         - model (Post): используемая модель.
         - context_object_name (str): Имя объекта `Post` используемое в шаблоне.
+        - replica_reads (bool): GET-запросы читают пост и комментарии с реплик БД (см. `ReplicaPinningMiddleware`).
 
     Context:
-        - comments_tree (list): Возвращает список словарей со всеми комментариями и их дочерними комментариями.
+        - comments_chunk (CommentChunk): Первая порция комментариев поста в порядке обхода дерева в глубину
+         (`CommentThreadPaginator`), остальные подгружаются со страницы через `comments_fragment_view`.
+        - replies_url (str): Адрес подгрузки комментариев.
         - form (AddCommentForm): Форма для создания комментария.
     """
     model = Post
     context_object_name = 'post'
+    replica_reads = True
+
+    def get_queryset(self):
+        return Post.objects.select_related('author')
+
+    def get_validators_queryset(self):
+        return (Post.objects.filter(slug=self.kwargs[self.slug_url_kwarg])
+                .values('last_modified', 'last_comment_at', 'comment_count'))
+
+    @staticmethod
+    def make_validators(row):
+        if row is None:
+            return None
+        last_modified = max(filter(None, [row['last_modified'], row['last_comment_at']]))
+        return last_modified, [row['last_modified'], row['last_comment_at'], row['comment_count']]
+
+    def get_validators(self):
+        return self.make_validators(self.get_validators_queryset().first())
+
+    def get_comments(self):
+        """Возвращает комментарии поста вместе с авторами в порядке обхода дерева в глубину."""
+        return self.object.comments.select_related('author').order_by('path')
+
+    def get_comments_paginator(self):
+        return CommentThreadPaginator(self.get_comments(), settings.BLOG_COMMENTS_PER_PAGE,
+                                      settings.BLOG_COMMENTS_MAX_DEPTH)
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        comments = self.object.comments.prefetch_related('child_comments')
-        context['comments_tree'] = Comment.make_recursive_comments_list(comments)
+        if 'comments_chunk' not in context:
+            context['comments_chunk'] = self.get_comments_paginator().chunk()
+        context['replies_url'] = reverse('blog:comments_fragment', args=[self.object.slug])
         context['form'] = AddCommentForm()
         return context
 
@@ -115,7 +357,173 @@ class PostDetailView(DetailView):
             comment.author = request.user
             comment.save()
             return redirect('blog:post_detail', slug=self.object.slug)
-        return render(request, self.template_name, self.get_context_data(form=form))
+        return self.render_to_response(self.get_context_data(form=form))
+
+
+class SearchView(FeedView):
+    """
+    Представление для полнотекстового поиска по постам.
+
+    Это class-based view который возвращает посты, найденные по запросу `q`, в порядке релевантности и рендерит
+    HTML-страницу. Наследуется от `FeedView`. Поиск выполняется бэкендом `get_search_backend()`.
+
+    Template:
+        - `blog/search.html`.
+
+    Model:
+        - `Post`.
+
+    Attributes:
+        - template_name (str): Имя шаблона, используемого для отображения результатов.
+        - pagination_mode (str): Только нумерованные страницы: курсор по дате не подходит для сортировки по рангу.
+        - max_query_length (int): Максимальная длина поискового запроса.
+        - page_cache (bool): Результаты поиска не кешируются: ключей столько же, сколько разных запросов.
+
+    Context:
+        - search_query (str): Поисковый запрос.
+        - pagination_params (str): Параметры запроса, добавляемые к ссылкам пагинации.
+    """
+    template_name = 'blog/search.html'
+    pagination_mode = 'pages'
+    page_cache = False
+    max_query_length = 200
+
+    def get_search_query(self):
+        return self.request.GET.get('q', '').strip()[:self.max_query_length]
+
+    def get_queryset(self):
+        return (get_search_backend().search(self.get_search_query())
+                .select_related('author').only(*self.preview_fields))
+
+    def get_post_count(self):
+        # Количество найденных постов считается по запросу, а не берётся из счётчика постов.
+        return None
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['search_query'] = self.get_search_query()
+        context['pagination_params'] = urlencode({'q': context['search_query']})
+        return context
+
+
+# Async views
+
+class AsyncPostListMixin:
+    """
+    Асинхронная обработка GET-запроса для `FeedView` и `PostsView`.
+
+    Количество постов, страница и сами посты загружаются асинхронным ORM (`acount`, `async for`), после чего
+    контекст собирается синхронным `get_context_data` родительского представления без обращений к БД.
+    Используется при запуске через ASGI (`settings.BLOG_ASYNC_VIEWS`).
+    """
+
+    async def aget_queryset(self):
+        return self.get_queryset()
+
+    async def aget_post_count(self):
+        return await get_post_counter().acount()
+
+    async def apaginate_queryset(self, queryset, page_size):
+        if self.get_pagination_mode() == 'cursor':
+            paginator = CursorPaginator(queryset, page_size)
+            try:
+                page = await paginator.apage(after=self.request.GET.get('after'),
+                                             before=self.request.GET.get('before'))
+            except InvalidPage as e:
+                raise Http404(str(e))
+            return paginator, page, page.object_list, page.has_other_pages()
+
+        count = await self.aget_post_count() if self.get_sort() == 'new' else await queryset.acount()
+        paginator = CountedPaginator(queryset, page_size, count=count,
+                                     orphans=self.get_paginate_orphans(),
+                                     allow_empty_first_page=self.get_allow_empty())
+        page = self.kwargs.get(self.page_kwarg) or self.request.GET.get(self.page_kwarg) or 1
+        try:
+            page_number = int(page)
+        except ValueError:
+            if page != 'last':
+                raise Http404('Неверный номер страницы')
+            page_number = paginator.num_pages
+        try:
+            page = paginator.page(page_number)
+        except InvalidPage as e:
+            raise Http404(str(e))
+        page.object_list = [post async for post in page.object_list]
+        return paginator, page, page.object_list, page.has_other_pages()
+
+    def paginate_queryset(self, queryset, page_size):
+        return self.pagination
+
+    async def get(self, request, *args, **kwargs):
+        request.user = await request.auser()
+        self.object_list = await self.aget_queryset()
+        self.pagination = await self.apaginate_queryset(self.object_list,
+                                                        self.get_paginate_by(self.object_list))
+        return self.render_to_response(self.get_context_data())
+
+
+class AsyncFeedView(AsyncPostListMixin, FeedView):
+    """Асинхронная версия `FeedView`."""
+
+    async def aget_validators(self):
+        aggregates = await Post.objects.aaggregate(**self.get_validators_aggregates())
+        return self.make_validators(aggregates, await get_post_counter().acount())
+
+
+class AsyncPostsView(AsyncPostListMixin, PostsView):
+    """Асинхронная версия `PostsView`."""
+
+    async def aget_queryset(self):
+        self.user_obj = await aget_object_or_404(User, username=self.kwargs['username'])
+        return self.get_queryset()
+
+    def get_queryset(self):
+        return super(PostsView, self).get_queryset().filter(author=self.user_obj)
+
+    async def aget_post_count(self):
+        return await get_post_counter().acount(author=self.user_obj)
+
+    async def aget_validators(self):
+        aggregates = await self.get_validators_queryset().aaggregate(count=Count('pk'),
+                                                                    **self.get_validators_aggregates())
+        return self.make_validators(aggregates, aggregates['count'])
+
+
+class AsyncPostDetailView(PostDetailView):
+    """
+    Асинхронная версия `PostDetailView`.
+
+    Пост и дерево комментариев загружаются асинхронным ORM, комментарий сохраняется через `asave`.
+    """
+
+    async def aget_object(self):
+        return await aget_object_or_404(Post.objects.select_related('author'), slug=self.kwargs['slug'])
+
+    async def aget_validators(self):
+        return self.make_validators(await self.get_validators_queryset().afirst())
+
+    async def aget_context_data(self, **kwargs):
+        comments_chunk = await self.get_comments_paginator().achunk()
+        return self.get_context_data(comments_chunk=comments_chunk, **kwargs)
+
+    async def get(self, request, *args, **kwargs):
+        request.user = await request.auser()
+        self.object = await self.aget_object()
+        return self.render_to_response(await self.aget_context_data())
+
+    async def post(self, request, *args, **kwargs):
+        request.user = await request.auser()
+        if not request.user.is_authenticated:
+            return redirect_to_login(request.get_full_path())
+        self.object = await self.aget_object()
+        form = AddCommentForm(request.POST)
+        if await sync_to_async(form.is_valid)():
+            comment = form.save(commit=False)
+            comment.post = self.object
+            comment.author = request.user
+            await comment.asave()
+            return redirect('blog:post_detail', slug=self.object.slug)
+        return self.render_to_response(await self.aget_context_data(form=form))
 
 
 class AddPostView(LoginRequiredMixin, CreateView):
@@ -296,4 +704,139 @@ class ProfileSettingsView(LoginRequiredMixin, UpdateView):
         return reverse_lazy("blog:posts_list", args=(self.request.user.username,))
 
     def get_object(self, queryset=None):
-        return self.request.user
+        # request.user из кеша загружен не со всеми полями (см. `CachedModelBackend`), форме нужны имя и фамилия.
+        return get_user_model().objects.get(pk=self.request.user.pk)
+
+
+@staff_member_required
+def performance_stats_view(request):
+    """
+    Представление со средними метриками запросов по каждому имени URL.
+
+    Возвращает JSON с данными `PerformanceMiddleware` текущего процесса. Доступно только персоналу.
+    """
+    return JsonResponse(stats.summary())
+
+
+def comments_fragment_view(request, slug):
+    """
+    Представление для подгрузки комментариев на странице поста.
+
+    Возвращает HTML-фрагмент (`blog/comments_chunk.html`) со следующей порцией ветки комментариев поста после курсора
+    `after` или, если передан `parent`, с ответами на комментарий `parent` (см. `CommentThreadPaginator`).
+    """
+    post = get_object_or_404(Post.objects.only('pk', 'slug'), slug=slug)
+    parent = None
+    if 'parent' in request.GET:
+        if not request.GET['parent'].isdigit():
+            raise Http404('Неверный комментарий')
+        parent = get_object_or_404(post.comments.only('pk', 'path', 'depth'), pk=request.GET['parent'])
+    paginator = CommentThreadPaginator(post.comments.select_related('author'), settings.BLOG_COMMENTS_PER_PAGE,
+                                       settings.BLOG_COMMENTS_MAX_DEPTH, parent)
+    try:
+        comments_chunk = paginator.chunk(after=request.GET.get('after'))
+    except InvalidPage as e:
+        raise Http404(str(e))
+    return render(request, 'blog/comments_chunk.html', {
+        'post': post,
+        'comments_chunk': comments_chunk,
+        'replies_url': request.path,
+        'form': AddCommentForm(),
+    })
+
+
+def posts_feed_view(request, feed_type, username=None):
+    """
+    Представление для лент постов в форматах Atom и RSS.
+
+    Лента всех постов (`username` не задан) или постов одного пользователя отдаётся `StreamingHttpResponse`
+    порциями по мере чтения постов из БД (см. `PostFeed`). `ETag` и `Last-Modified` вычисляются одним
+    запросом, поэтому периодические запросы агрегаторов без изменений получают `304 Not Modified`, а с
+    изменениями - ленту из кеша, пока посты снова не изменятся.
+    """
+    if feed_type not in PostFeed.feed_types:
+        raise Http404('Неизвестный формат ленты')
+    author = None
+    if username is not None:
+        author = get_object_or_404(User.objects.only('pk', 'username'), username=username)
+    feed = PostFeed(request, feed_type, author)
+    validators = feed.get_validators()
+    etag = 'W/"%s"' % feed.make_key(validators).rsplit(':', 1)[-1]
+
+    @condition(etag_func=lambda request: etag, last_modified_func=lambda request: validators[0])
+    def view(request):
+        content_type = feed.feed_types[feed_type].content_type
+        return StreamingHttpResponse(feed.stream(validators), content_type=content_type)
+
+    return view(request)
+
+
+@never_cache
+def header_fragment_view(request):
+    """
+    Представление для блока пользователя в шапке страницы (`blog/header_user.html`).
+
+    При `settings.BLOG_HEADER_SSI` закешированные страницы содержат вместо блока SSI-вставку этого адреса, и nginx
+    подставляет блок для каждого запроса отдельно (см. `PageCacheMixin`).
+    """
+    return render(request, 'blog/header_user.html')
+
+
+def sitemap_index_view(request):
+    """
+    Представление для индекса карты сайта (`sitemap.xml`).
+
+    Перечисляет шарды разделов карты сайта (`blog:sitemap_section`) с датами их последнего изменения.
+    """
+    return HttpResponse(render_sitemap_index(request), content_type='application/xml')
+
+
+def sitemap_section_view(request, section, shard):
+    """
+    Представление для шарда раздела карты сайта.
+
+    Адреса шарда читаются из БД итератором и отдаются `StreamingHttpResponse`, готовый XML кешируется до
+    изменения объектов шарда (см. `SitemapSection`).
+    """
+    if section not in SECTIONS:
+        raise Http404('Неизвестный раздел карты сайта')
+    section = SECTIONS[section](request)
+    validators = section.get_validators(shard)
+    if not validators[1]:
+        raise Http404('Пустой шард карты сайта')
+
+    @condition(last_modified_func=lambda request: validators[0])
+    def view(request):
+        return StreamingHttpResponse(section.stream(shard, validators), content_type='application/xml')
+
+    return view(request)
+
+
+def search_api_view(request):
+    """
+    API полнотекстового поиска по постам.
+
+    Принимает параметры `q` (запрос) и `limit` (кол-во результатов, не больше 50) и возвращает JSON со списком
+    найденных постов в порядке релевантности.
+    """
+    query = request.GET.get('q', '').strip()[:SearchView.max_query_length]
+    try:
+        limit = min(max(int(request.GET.get('limit', 10)), 1), 50)
+    except ValueError:
+        limit = 10
+    posts = (get_search_backend().search(query).select_related('author')
+             .only('title', 'slug', 'excerpt', 'date_created', 'author__username')[:limit])
+    return JsonResponse({
+        'query': query,
+        'results': [
+            {
+                'title': post.title,
+                'url': post.get_absolute_url(),
+                'author': post.author.username,
+                'date_created': post.date_created.isoformat(),
+                'excerpt': post.excerpt,
+                'rank': float(post.rank),
+            }
+            for post in posts
+        ],
+    })
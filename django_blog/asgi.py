@@ -7,10 +7,17 @@ For more information on this file, see
 https://docs.djangoproject.com/en/5.1/howto/deployment/asgi/
 """
 
+import atexit
 import os
 
 from django.core.asgi import get_asgi_application
 
+from django_blog.db import close_db_connections
+
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'django_blog.settings')
+# Отключает постоянные соединения с БД (см. DJANGO_ASGI в settings).
+os.environ['DJANGO_ASGI'] = '1'
 
 application = get_asgi_application()
+
+atexit.register(close_db_connections)
@@ -0,0 +1,76 @@
+"""
+Работа с базами данных на уровне проекта.
+
+- Завершение работы с базой данных при остановке процесса. Используется WSGI/ASGI-приложениями и хуками
+  gunicorn, чтобы воркер при выходе закрыл постоянные соединения всех своих потоков и пул psycopg, а не оставлял
+  их обрываться на стороне PostgreSQL.
+- Роутер чтений на реплики (`PrimaryReplicaRouter`).
+"""
+
+import random
+import threading
+import weakref
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+replica_reads = ContextVar('replica_reads', default=False)
+
+# Соединения всех потоков процесса. `connections` хранит соединения отдельно для каждого потока, поэтому
+# `connections.close_all()` из главного потока не видит постоянных соединений потоков-обработчиков (gthread,
+# sync_to_async). Соединение завершившегося потока удаляется из множества сборщиком мусора.
+_thread_connections = weakref.WeakSet()
+_thread_connections_lock = threading.Lock()
+
+
+@receiver(connection_created)
+def register_connection(sender, connection, **kwargs):
+    with _thread_connections_lock:
+        _thread_connections.add(connection)
+
+
+def close_db_connections():
+    """Закрывает открытые соединения со всеми базами данных во всех потоках и их пулы соединений."""
+    connections.close_all()
+    with _thread_connections_lock:
+        thread_connections = list(_thread_connections)
+    for connection in thread_connections:
+        # Соединение другого потока можно закрыть только с разрешённым разделением между потоками.
+        connection.inc_thread_sharing()
+        try:
+            connection.close()
+        finally:
+            connection.dec_thread_sharing()
+    for connection in connections.all():
+        if connection.settings_dict.get('OPTIONS', {}).get('pool'):
+            connection.close_pool()
+
+
+class PrimaryReplicaRouter:
+    """
+    Роутер, направляющий чтения на реплики (`settings.DB_REPLICAS`), а запись - на primary (`default`).
+
+    Чтения уходят на случайную реплику только при включённом `replica_reads` (его включает
+    `blog.middleware.ReplicaPinningMiddleware` для GET-запросов к представлениям с `replica_reads = True`) и
+    только для моделей `app_labels`: сессии и пользователи всегда читаются с primary, чтобы вход, выход и смена
+    пароля действовали сразу. Все реплики - копии primary, поэтому связи между объектами из разных БД
+    разрешены, а миграции применяются только к primary.
+    """
+    app_labels = {'blog'}
+
+    def db_for_read(self, model, **hints):
+        if settings.DB_REPLICAS and replica_reads.get() and model._meta.app_label in self.app_labels:
+            return random.choice(settings.DB_REPLICAS)
+        return DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return False if db in settings.DB_REPLICAS else None
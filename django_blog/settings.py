@@ -1,5 +1,6 @@
 from pathlib import Path
 import os
+import sys
 
 # from dotenv import load_dotenv
 #
@@ -28,25 +29,29 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'blog.middleware.PerformanceMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'blog.middleware.ReplicaPinningMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
 ROOT_URLCONF = 'django_blog.urls'
 
+# Шаблоны. Загрузчики не указаны: при APP_DIRS=True и DEBUG=0 Django сам оборачивает их в cached.Loader, и
+# скомпилированные шаблоны живут всё время работы процесса (изменения подхватываются только после перезапуска).
+# Контекстный процессор debug подключается только при DEBUG=1.
 TEMPLATES = [
     {
         'BACKEND': 'django.template.backends.django.DjangoTemplates',
         'DIRS': [BASE_DIR / 'templates'],
         'APP_DIRS': True,
         'OPTIONS': {
-            'context_processors': [
-                'django.template.context_processors.debug',
+            'context_processors': (['django.template.context_processors.debug'] if DEBUG else []) + [
                 'django.template.context_processors.request',
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
@@ -60,6 +65,17 @@ WSGI_APPLICATION = 'django_blog.wsgi.application'
 
 # Database
 
+# Пул соединений psycopg (только PostgreSQL с драйвером psycopg 3). Пул несовместим с постоянными соединениями
+# Django, поэтому при DB_POOL=1 CONN_MAX_AGE принудительно равен 0. CONN_HEALTH_CHECKS для пула включает проверку
+# соединения перед выдачей из пула.
+DB_POOL = bool(int(os.getenv('DB_POOL', 0)))
+
+# Под ASGI запрос обращается к БД из своего потока sync_to_async, и постоянное соединение этого потока больше не
+# используется, но и не закрывается, пока не истечёт CONN_MAX_AGE: соединения копятся до max_connections сервера.
+# Поэтому при запуске через django_blog.asgi (он выставляет DJANGO_ASGI=1) CONN_MAX_AGE принудительно равен 0,
+# а переиспользовать соединения можно только пулом (DB_POOL=1).
+DJANGO_ASGI = bool(int(os.getenv('DJANGO_ASGI', 0)))
+
 DATABASES = {
     'default': {
         'ENGINE': os.environ.get("DB_ENGINE", 'django.db.backends.postgresql'),
@@ -67,11 +83,68 @@ DATABASES = {
         'USER': os.getenv('DB_USER', 'postgres'),
         'PASSWORD': os.getenv('DB_PASSWORD', 'postgres'),
         'HOST': os.getenv('DB_HOST', 'db'),
-        'PORT': os.getenv('DB_PORT', '5432')
+        'PORT': os.getenv('DB_PORT', '5432'),
+        'CONN_MAX_AGE': 0 if DB_POOL or DJANGO_ASGI else int(os.getenv('DB_CONN_MAX_AGE', 60)),
+        'CONN_HEALTH_CHECKS': bool(int(os.getenv('DB_CONN_HEALTH_CHECKS', 1))),
+    }
+}
+
+if DB_POOL and DATABASES['default']['ENGINE'] == 'django.db.backends.postgresql':
+    DATABASES['default']['OPTIONS'] = {
+        'pool': {
+            'min_size': int(os.getenv('DB_POOL_MIN_SIZE', 2)),
+            'max_size': int(os.getenv('DB_POOL_MAX_SIZE', 10)),
+            'max_lifetime': float(os.getenv('DB_POOL_MAX_LIFETIME', 30 * 60)),
+            'max_idle': float(os.getenv('DB_POOL_MAX_IDLE', 10 * 60)),
+            'timeout': float(os.getenv('DB_POOL_TIMEOUT', 30)),
+        },
+    }
+
+# Реплики для чтения: DB_REPLICAS - адреса (HOST) реплик через запятую, для SQLite - пути к файлам баз (NAME).
+# Остальные параметры соединения берутся из default. Реплики получают псевдонимы replica1, replica2, ... и
+# используются роутером django_blog.db.PrimaryReplicaRouter только для GET-запросов к представлениям с
+# replica_reads = True. После изменяющего запроса клиент на BLOG_REPLICA_PIN_SECONDS секунд закрепляется за
+# primary (cookie, см. blog.middleware.ReplicaPinningMiddleware), чтобы видеть свои изменения несмотря на
+# отставание реплик.
+DB_REPLICAS = []
+for number, replica in enumerate(filter(None, os.getenv('DB_REPLICAS', '').split(',')), 1):
+    alias = f'replica{number}'
+    location = 'NAME' if DATABASES['default']['ENGINE'] == 'django.db.backends.sqlite3' else 'HOST'
+    DATABASES[alias] = {**DATABASES['default'], location: replica.strip(), 'TEST': {'MIRROR': 'default'}}
+    DB_REPLICAS.append(alias)
+
+# В тестах (manage.py test) без настроенных реплик добавляется реплика replica1 - зеркало тестовой БД default со своим
+# соединением, чтобы тесты с override_settings(DB_REPLICAS=['replica1']) проверяли, какое соединение выполнило чтение.
+if sys.argv[1:2] == ['test'] and not DB_REPLICAS:
+    DATABASES['replica1'] = {**DATABASES['default'], 'TEST': {'MIRROR': 'default'}}
+
+DATABASE_ROUTERS = ['django_blog.db.PrimaryReplicaRouter']
+BLOG_REPLICA_PIN_SECONDS = int(os.environ.get("BLOG_REPLICA_PIN_SECONDS", 10))
+
+
+# Cache
+
+CACHES = {
+    'default': {
+        'BACKEND': os.environ.get("CACHE_BACKEND", 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.environ.get("CACHE_LOCATION", ''),
     }
 }
 
 
+# Sessions and authentication
+
+# Хранилище сессий (SESSION_ENGINE): cached_db (по умолчанию) - сессия читается из кеша, а в БД только пишется;
+# signed_cookies - данные сессии хранятся в подписанной cookie без обращений к БД и кешу (выход очищает cookie
+# только у клиента); db - только БД. Для нескольких процессов cached_db нужен общий кеш (CACHE_BACKEND),
+# иначе промахи кеша читают сессию из БД.
+SESSION_ENGINE = 'django.contrib.sessions.backends.' + os.environ.get("SESSION_ENGINE", 'cached_db')
+
+# Пользователь сессии кешируется на BLOG_USER_CACHE_TIMEOUT секунд (blog.backends.CachedModelBackend).
+AUTHENTICATION_BACKENDS = ['blog.backends.CachedModelBackend']
+BLOG_USER_CACHE_TIMEOUT = int(os.environ.get("BLOG_USER_CACHE_TIMEOUT", 5 * 60))
+
+
 # Password validation
 
 AUTH_PASSWORD_VALIDATORS = [
@@ -118,6 +191,67 @@ LOGIN_URL = 'blog:login'
 LOGIN_REDIRECT_URL = 'blog:feed_page'
 LOGOUT_REDIRECT_URL = 'blog:feed_page'
 
+# Blog
+
+# Асинхронные версии FeedView, PostsView и PostDetailView. Включать при запуске через ASGI (uvicorn).
+BLOG_ASYNC_VIEWS = bool(int(os.environ.get("BLOG_ASYNC_VIEWS", 0)))
+
+# 'pages' - нумерованные страницы, 'cursor' - курсорная пагинация ленты без COUNT(*) и OFFSET.
+BLOG_PAGINATION_MODE = os.environ.get("BLOG_PAGINATION_MODE", 'pages')
+
+# Источник количества постов для нумерованной пагинации: ExactPostCounter (COUNT(*) на каждый запрос),
+# CachedPostCounter (счётчик в кеше, обновляемый сигналами) или PostgresEstimatePostCounter (pg_class.reltuples).
+BLOG_POST_COUNTER = os.environ.get("BLOG_POST_COUNTER", 'blog.counters.CachedPostCounter')
+BLOG_POST_COUNT_TIMEOUT = int(os.environ.get("BLOG_POST_COUNT_TIMEOUT", 60 * 60))
+
+# Комментарии на странице поста загружаются порциями по BLOG_COMMENTS_PER_PAGE в порядке обхода дерева, сразу
+# показываются BLOG_COMMENTS_MAX_DEPTH уровней. Остальное подгружается со страницы по ссылкам (blog:comments_fragment).
+BLOG_COMMENTS_PER_PAGE = int(os.environ.get("BLOG_COMMENTS_PER_PAGE", 50))
+BLOG_COMMENTS_MAX_DEPTH = int(os.environ.get("BLOG_COMMENTS_MAX_DEPTH", 5))
+
+# Версия, входящая в ETag страниц с постами (ConditionalGetMixin). Менять при выкладке изменённых шаблонов,
+# чтобы браузеры и прокси не получали 304 на устаревшую разметку.
+BLOG_ETAG_VERSION = os.environ.get("BLOG_ETAG_VERSION", '1')
+
+# Конфигурация текстового поиска PostgreSQL для Post.search_vector. На других СУБД используется инвертированный
+# индекс PostTerm (blog.search).
+BLOG_SEARCH_CONFIG = os.environ.get("BLOG_SEARCH_CONFIG", 'russian')
+
+# Кеш страниц ленты, пользователей и постов для анонимных GET-запросов (blog.views.PageCacheMixin) на
+# BLOG_PAGE_CACHE_TIMEOUT секунд (0 - отключить), сбрасывается при изменении постов и комментариев. nginx
+# дополнительно кеширует такие ответы на BLOG_PAGE_CACHE_PROXY_TIMEOUT секунд (заголовок X-Accel-Expires).
+# При BLOG_HEADER_SSI блок пользователя в шапке подставляется nginx через SSI (ssi on в nginx/nginx.conf), и
+# закешированная лента отдаётся также авторизованным пользователям.
+BLOG_PAGE_CACHE_TIMEOUT = int(os.environ.get("BLOG_PAGE_CACHE_TIMEOUT", 10 * 60))
+BLOG_PAGE_CACHE_PROXY_TIMEOUT = int(os.environ.get("BLOG_PAGE_CACHE_PROXY_TIMEOUT", 10))
+BLOG_HEADER_SSI = bool(int(os.environ.get("BLOG_HEADER_SSI", 0)))
+
+# Ленты Atom/RSS (blog:posts_feed, blog:user_posts_feed) содержат BLOG_FEED_ITEMS последних постов. Посты читаются
+# из БД и отдаются порциями по BLOG_FEED_CHUNK_SIZE, порции кешируются на BLOG_FEED_CACHE_TIMEOUT секунд (ключ
+# меняется при изменении постов).
+BLOG_FEED_ITEMS = int(os.environ.get("BLOG_FEED_ITEMS", 50))
+BLOG_FEED_CHUNK_SIZE = int(os.environ.get("BLOG_FEED_CHUNK_SIZE", 200))
+BLOG_FEED_CACHE_TIMEOUT = int(os.environ.get("BLOG_FEED_CACHE_TIMEOUT", 24 * 60 * 60))
+
+# Карта сайта (blog:sitemap): шарды разделов содержат не больше BLOG_SITEMAP_SHARD_SIZE адресов (лимит протокола -
+# 50 000), XML шардов кешируется на BLOG_SITEMAP_CACHE_TIMEOUT секунд (ключ меняется при изменении объектов шарда).
+BLOG_SITEMAP_SHARD_SIZE = int(os.environ.get("BLOG_SITEMAP_SHARD_SIZE", 50000))
+BLOG_SITEMAP_CACHE_TIMEOUT = int(os.environ.get("BLOG_SITEMAP_CACHE_TIMEOUT", 24 * 60 * 60))
+
+# Метрики PerformanceMiddleware: заголовки Server-Timing/X-DB-Queries и бюджеты SQL-запросов по именам URL.
+# При BLOG_QUERY_BUDGETS_STRICT превышение бюджета выбрасывает исключение вместо предупреждения в лог.
+# Бюджеты - кол-во запросов авторизованного пользователя при пустом кеше: запросы анонимного пользователя плюс
+# сессия и пользователь (проверяется PerformanceMiddlewareTest.test_budgets).
+BLOG_PERFORMANCE_HEADERS = bool(int(os.environ.get("BLOG_PERFORMANCE_HEADERS", DEBUG)))
+BLOG_QUERY_BUDGETS = {
+    'blog:feed_page': 5,
+    'blog:posts_list': 6,
+    'blog:post_detail': 5,
+    'blog:search': 6,
+    'blog:comments_fragment': 6,
+}
+BLOG_QUERY_BUDGETS_STRICT = bool(int(os.environ.get("BLOG_QUERY_BUDGETS_STRICT", 0)))
+
 # SMTP server
 
 EMAIL_HOST = "smtp.yandex.ru"
@@ -1,15 +1,6 @@
 #!/bin/sh
 
-echo "Create migrations"
-python manage.py makemigrations --noinput
+echo "Bootstrap: apply migrations, load fixtures and collect static files if needed"
+python manage.py bootstrap
 
-echo "Apply database migrations"
-python manage.py migrate
-
-echo "Preload database data"
-python manage.py loaddata --format=json db_data
-
-echo "Collect static files"
-python manage.py collectstatic --noinput
-
-exec "$@"
\ No newline at end of file
+exec "$@"
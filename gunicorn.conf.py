@@ -0,0 +1,52 @@
+"""
+Конфигурация gunicorn.
+
+Gunicorn читает этот файл автоматически при запуске из корня проекта (`gunicorn` без аргументов).
+Все параметры можно переопределить переменными окружения:
+
+- GUNICORN_WORKER_CLASS - класс воркеров:
+    - `sync` - один запрос на процесс;
+    - `gthread` (по умолчанию) - пул потоков в каждом процессе, хорошо подходит для ожидания БД;
+    - `uvicorn_worker.UvicornWorker` - ASGI-воркер (`django_blog.asgi`), вместе с `BLOG_ASYNC_VIEWS=1`.
+- GUNICORN_WORKERS - кол-во процессов, по умолчанию `2 * CPU + 1`.
+- GUNICORN_THREADS - кол-во потоков в процессе для `gthread`, по умолчанию 4.
+- GUNICORN_PRELOAD - загружать приложение в мастер-процессе до fork (по умолчанию 1), чтобы воркеры
+  разделяли память с импортированным кодом и быстрее стартовали. Импорт приложения не открывает соединений
+  с БД, поэтому воркеры не наследуют их от мастер-процесса.
+- GUNICORN_MAX_REQUESTS, GUNICORN_MAX_REQUESTS_JITTER - перезапуск воркера после случайного (в пределах jitter)
+  кол-ва запросов, чтобы ограничить рост памяти и не перезапускать все воркеры одновременно.
+- GUNICORN_TIMEOUT, GUNICORN_KEEPALIVE, GUNICORN_BIND.
+
+С потоками каждый поток держит своё соединение с БД: `workers * threads` не должно превышать
+`max_connections` PostgreSQL (или используйте пул соединений, `DB_POOL=1`).
+"""
+
+import multiprocessing
+import os
+
+worker_class = os.environ.get('GUNICORN_WORKER_CLASS', 'gthread')
+asgi = worker_class.endswith('UvicornWorker')
+
+wsgi_app = 'django_blog.asgi:application' if asgi else 'django_blog.wsgi:application'
+bind = os.environ.get('GUNICORN_BIND', '0.0.0.0:8000')
+
+workers = int(os.environ.get('GUNICORN_WORKERS', multiprocessing.cpu_count() * 2 + 1))
+threads = int(os.environ.get('GUNICORN_THREADS', 4 if worker_class == 'gthread' else 1))
+preload_app = bool(int(os.environ.get('GUNICORN_PRELOAD', 1)))
+
+max_requests = int(os.environ.get('GUNICORN_MAX_REQUESTS', 1000))
+max_requests_jitter = int(os.environ.get('GUNICORN_MAX_REQUESTS_JITTER', 100))
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 30))
+graceful_timeout = timeout
+keepalive = int(os.environ.get('GUNICORN_KEEPALIVE', 5))
+
+accesslog = '-'
+# %(M)s - время обработки запроса в миллисекундах.
+access_log_format = '%(h)s "%(r)s" %(s)s %(b)s %(M)sms "%(a)s"'
+
+
+def worker_exit(server, worker):
+    """Закрывает соединения и пул соединений с БД при остановке воркера."""
+    from django_blog.db import close_db_connections
+
+    close_db_connections()